@@ -4,7 +4,19 @@ __all__ = [
     "api",
     "embeddings",
     "vector_store",
+    "index_backends",
     "cache",
+    "cache_log",
+    "lexical",
+    "cache_policy",
+    "diversity",
     "prompt_builder",
     "llm_client",
+    "executors",
+    "text_utils",
+    "singleflight",
+    "segmenter",
+    "edits",
+    "triage",
+    "quantization",
 ]
@@ -1,11 +1,33 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
-from .models import CorrectionRequest, CorrectionResponse
-from .vector_store import VectorStore
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+import hmac
+import json
+import os
+import time
+import numpy as np
+from .models import (
+    BatchCorrectionRequest,
+    BatchCorrectionResponse,
+    BatchItemResult,
+    CorrectionRequest,
+    CorrectionResponse,
+    DocumentCorrectionRequest,
+    DocumentCorrectionResponse,
+    SentenceCorrection,
+)
+from .vector_store import VectorStore, current_version, resolve_version
 from .cache import SemanticCache
+from .embeddings import EmbeddingContext, embed_texts, embedding_dim, get_batcher, warm_up
 from .prompt_builder import build_prompt
-from .llm_client import call_llm, call_llm_async
+from .llm_client import call_llm, call_llm_async, stream_llm_async, max_tokens_for, JSONFieldStream, get_client, get_router
+from .executors import run_compute, run_io, submit_write, shutdown as shutdown_executors
+from .singleflight import SingleFlight
+from .text_utils import text_key
+from .segmenter import split_sentences
+from .triage import Triage
+from .lexical import RETRIEVAL_MODES, load_lexical
 from .config import settings
 from .logger import logger
 import asyncio
@@ -13,44 +35,143 @@ import asyncio
 
 app = FastAPI(title="GEC RAG+CoT Service")
 
-support_store = VectorStore(path="./data/support_index.npz")
-support_store.load("./data/support_index.npz")
+SUPPORT_INDEX_PATH = settings.SUPPORT_INDEX_PATH
+CACHE_INDEX_PATH = settings.CACHE_INDEX_PATH
 
-cache = SemanticCache(path="./data/cache_index.npz")
-cache.load("./data/cache_index.npz")
+# indexes and the embedding model are loaded by a startup task (see `load_state`),
+# so importing this module and binding the port are fast
+support_store = VectorStore(path=SUPPORT_INDEX_PATH, index_type=settings.SUPPORT_INDEX_TYPE, storage=settings.SUPPORT_STORAGE)
+cache = SemanticCache(path=CACHE_INDEX_PATH)
+
+# `support_store` is replaced wholesale by `reload_support`; searches already running
+# hold a reference to the previous store and finish on it
+support_version: Dict[str, Any] = {"version": None, "path": None, "count": 0, "loaded_at": None}
+_reload_lock = asyncio.Lock()
+
+# component -> loaded; the service is ready once all are true
+readiness: Dict[str, bool] = {"support_index": False, "cache_index": False, "model": False}
+startup_error: str | None = None
+
+# coalesces identical concurrent requests so only one reaches the LLM
+inflight = SingleFlight()
+
+# predicts already-correct sentences from their support-set neighbours
+triage = Triage()
 
 
 @app.post("/correct", response_model=CorrectionResponse)
 async def correct(req: CorrectionRequest):
-    # check semantic cache first
-    hit = cache.query(req.input)
+    # exact-match tier answers byte-identical resubmissions without embedding
+    hit = cache.lookup_exact(req.input)
     if hit:
-        logger.info("cache hit for input")
+        logger.info("exact cache hit for input")
         return hit
 
     # determine retrieval usage and k
     use_retrieval = getattr(req, "use_retrieval", True) and settings.RETRIEVAL_ENABLED
     top_k = req.top_k or settings.TOP_K
 
-    # retrieve few-shot examples (or empty list if disabled)
-    if use_retrieval and top_k > 0:
-        retrieved = [m for m, s in support_store.query(req.input, top_k=top_k)]
-    else:
-        retrieved = []
+    # identical in-flight requests await the leader's result instead of calling the LLM again
+    key = (text_key(req.input), top_k, use_retrieval)
+    return await inflight.do(key, lambda: _correct_uncached(req, top_k, use_retrieval))
+
+
+async def _correct_uncached(req: CorrectionRequest, top_k: int, use_retrieval: bool) -> CorrectionResponse:
+    # encode the input once; the vector is shared by cache, retrieval and upsert
+    ctx = EmbeddingContext(req.input)
+
+    # encode via the micro-batcher, then check the semantic cache on the compute pool
+    if cache.semantic_enabled:
+        vec = await ctx.avector()
+        hit = await run_compute(cache.query_vector, vec)
+        if hit:
+            logger.info("cache hit for input")
+            return hit
+
+    # retrieve few-shot examples (or empty list if disabled); triage votes over the same neighbours
+    k = _neighbour_k(use_retrieval, top_k)
+    results = (await _neighbours([ctx], k))[0] if k > 0 else []
+    retrieved = _shots(results, use_retrieval, top_k)
+
+    predicted = _triage(results)
+    if triage.skips(predicted):
+        return _unchanged(req)
+    response = await _generate(req, ctx, retrieved, top_k)
+    triage.audit(predicted, req.input, response.correction)
+    return response
+
+
+async def _neighbours(ctxs: List[EmbeddingContext], k: int) -> List[List[tuple]]:
+    """Support-set neighbours per RETRIEVAL_MODE; lexical mode never computes a vector.
+
+    With SHOT_SELECTION=mmr each hit also carries its stored embedding.
+    """
+    store = support_store
+    mode = settings.RETRIEVAL_MODE
+    with_vectors = settings.SHOT_SELECTION == "mmr"
+    texts = [c.text for c in ctxs]
+    if mode == "lexical":
+        return await run_compute(store.query_lexical, texts, top_k=k, with_vectors=with_vectors)
+    # vectors not computed for the cache go through the micro-batcher together
+    vecs = np.stack(await asyncio.gather(*(c.avector() for c in ctxs)))
+    if mode == "hybrid":
+        return await run_compute(store.query_hybrid, texts, vecs, top_k=k, with_vectors=with_vectors)
+    return await run_compute(store.query_batch, vecs, top_k=k, with_vectors=with_vectors)
+
 
-    prompt = build_prompt(req.input, retrieved, top_k=top_k)
+def _triage(results) -> bool | None:
+    # triage thresholds are cosine similarities; lexical results carry BM25 scores
+    return triage.decide([r[:2] for r in results] if settings.RETRIEVAL_MODE != "lexical" else [])
 
-    # call LLM asynchronously; fall back to sync if async not supported
+
+def _shots(results, use_retrieval: bool, top_k: int) -> List[Dict]:
+    """Few-shot candidates for `build_prompt`; for MMR every candidate carries its score and embedding."""
+    if not use_retrieval:
+        return []
+    if settings.SHOT_SELECTION != "mmr":
+        return [r[0] for r in results[:top_k]]
+    return [dict(m, score=s, embedding=v) for m, s, v in results]
+
+
+def _neighbour_k(use_retrieval: bool, top_k: int) -> int:
+    k = 0
+    if use_retrieval:
+        k = max(top_k, settings.MMR_FETCH_K) if settings.SHOT_SELECTION == "mmr" else top_k
+    return max(k, triage.k) if triage.enabled else k
+
+
+def _unchanged(req: CorrectionRequest) -> CorrectionResponse:
+    # triage fast path: predicted already correct, no LLM call
+    return CorrectionResponse(input=req.input, reasoning="", correction=req.input, error_type=None)
+
+
+async def _generate(req: CorrectionRequest, ctx: EmbeddingContext, retrieved: List[Dict], top_k: int) -> CorrectionResponse:
+    """Prompt + LLM stage shared by single, batch and document requests."""
     out = None
-    try:
-        out = await call_llm_async(prompt)
-    except Exception as e:
-        logger.exception("Async LLM failed, falling back to sync: %s", e)
-        out = call_llm(prompt)
+    if settings.OUTPUT_MODE == "edits":
+        # compact answer: token edits validated and applied to the input locally
+        prompt = build_prompt(req.input, retrieved, top_k=top_k, output_mode="edits")
+        try:
+            out = await call_llm_async(prompt, max_tokens=max_tokens_for(req.input, "edits"), source_text=req.input, input_text=req.input)
+        except Exception as e:
+            logger.exception("Edit-mode LLM call failed: %s", e)
+        if not out or not out.get("correction"):
+            logger.warning("No valid edits from LLM; retrying with full output")
+            out = None
+
+    if out is None:
+        prompt = build_prompt(req.input, retrieved, top_k=top_k)
+        max_tokens = max_tokens_for(req.input)
+        # call LLM asynchronously; fall back to sync if async not supported
+        try:
+            out = await call_llm_async(prompt, max_tokens=max_tokens, input_text=req.input)
+        except Exception as e:
+            logger.exception("Async LLM failed, falling back to sync: %s", e)
+            out = await run_io(call_llm, prompt, max_tokens)
 
     if not out or not out.get("correction"):
         # LLM failed to produce valid output; if we have a close cache item, return it
-        fallback = cache.query(req.input)
+        fallback = await run_compute(cache.query_vector, await ctx.avector()) if cache.semantic_enabled else None
         if fallback:
             logger.warning("LLM failed; returning cached fallback")
             return fallback
@@ -62,20 +183,464 @@ async def correct(req: CorrectionRequest):
             reasoning=out.get("reasoning", ""),
             correction=out.get("correction", ""),
             error_type=out.get("error_type"),
+            edits=out.get("edits"),
         )
     except Exception as e:
         logger.exception("Failed to build CorrectionResponse: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-    # update cache asynchronously (do not block response)
-    try:
-        cache.upsert(req.input, response)
-    except Exception:
-        logger.exception("Failed to upsert into cache")
+    # update cache on the writer thread (fire-and-forget, does not block response);
+    # without a vector yet (lexical retrieval, no semantic tier) it is encoded there
+    submit_write(cache.upsert, req.input, response, vec=ctx.computed)
 
     return response
 
 
+@app.post("/correct/batch", response_model=BatchCorrectionResponse)
+async def correct_batch(batch: BatchCorrectionRequest):
+    return BatchCorrectionResponse(results=await _correct_many(batch.items))
+
+
+async def _correct_many(reqs: List[CorrectionRequest], on_result: Callable[[BatchItemResult], None] | None = None) -> List[BatchItemResult]:
+    """Batched pipeline: exact tier, one embedding call, one cache search, one
+    retrieval search for the misses, triage, then concurrent LLM calls.
+
+    Results keep input order and carry a per-item status; `on_result` is called
+    with each item as soon as it completes (used by the streaming endpoints).
+    """
+    results: List[BatchItemResult | None] = [None] * len(reqs)
+
+    def _set(i: int, res: BatchItemResult):
+        results[i] = res
+        if on_result is not None:
+            on_result(res)
+
+    # 1) exact tier
+    pending = []
+    for i, r in enumerate(reqs):
+        hit = cache.lookup_exact(r.input)
+        if hit:
+            _set(i, BatchItemResult(index=i, status="cached", result=hit))
+        else:
+            pending.append(i)
+
+    # 2) one batched encode and one batched semantic-cache lookup
+    if pending:
+        ctxs: Dict[int, EmbeddingContext] = {i: EmbeddingContext(reqs[i].input) for i in pending}
+        hits = [None] * len(pending)
+        if cache.semantic_enabled:
+            vecs = await run_compute(embed_texts, [reqs[i].input for i in pending])
+            hits = await run_compute(cache.query_vectors, vecs)
+            ctxs = {i: EmbeddingContext(reqs[i].input, vector=vecs[j]) for j, i in enumerate(pending)}
+        misses = []
+        for j, i in enumerate(pending):
+            if hits[j]:
+                _set(i, BatchItemResult(index=i, status="cached", result=hits[j]))
+            else:
+                misses.append(i)
+
+        # 3) one batched retrieval for the misses that want few-shot examples or triage
+        params = {}
+        for i in misses:
+            use_retrieval = reqs[i].use_retrieval and settings.RETRIEVAL_ENABLED
+            params[i] = (use_retrieval, reqs[i].top_k or settings.TOP_K)
+        want = [i for i in misses if _neighbour_k(*params[i]) > 0]
+        retrieved: Dict[int, List[Dict]] = {i: [] for i in misses}
+        predicted: Dict[int, bool | None] = {i: triage.decide([]) for i in misses if i not in want}
+        if want:
+            max_k = max(_neighbour_k(*params[i]) for i in want)
+            found = await _neighbours([ctxs[i] for i in want], max_k)
+            for i, res in zip(want, found):
+                use_retrieval, top_k = params[i]
+                retrieved[i] = _shots(res, use_retrieval, top_k)
+                predicted[i] = _triage(res)
+        llm = []
+        for i in misses:
+            if triage.skips(predicted[i]):
+                _set(i, BatchItemResult(index=i, status="triaged", result=_unchanged(reqs[i])))
+            else:
+                llm.append(i)
+
+        # 4) concurrent LLM fan-out under a concurrency limit
+        sem = asyncio.Semaphore(settings.BATCH_LLM_CONCURRENCY)
+
+        async def run_one(i: int):
+            use_retrieval, top_k = params[i]
+            key = (text_key(reqs[i].input), top_k, use_retrieval)
+            async with sem:
+                try:
+                    res = await inflight.do(key, lambda: _generate(reqs[i], ctxs[i], retrieved[i], top_k))
+                    triage.audit(predicted[i], reqs[i].input, res.correction)
+                    _set(i, BatchItemResult(index=i, status="ok", result=res))
+                except HTTPException as e:
+                    _set(i, BatchItemResult(index=i, status="error", error=str(e.detail)))
+                except Exception as e:
+                    logger.exception("Batch item %s failed", i)
+                    _set(i, BatchItemResult(index=i, status="error", error=str(e)))
+
+        await asyncio.gather(*(run_one(i) for i in llm))
+
+    return results
+
+
+@app.post("/correct/document", response_model=DocumentCorrectionResponse)
+async def correct_document(req: DocumentCorrectionRequest):
+    """Paragraph/document mode: correct each sentence independently and stitch.
+
+    Sentences go through the batched pipeline, so unchanged or repeated
+    sentences are served from the cache and the rest are corrected concurrently.
+    """
+    spans = split_sentences(req.input)
+    reqs = [CorrectionRequest(input=sent, top_k=req.top_k, use_retrieval=req.use_retrieval) for _, _, sent in spans]
+    results = await _correct_many(reqs)
+    return _stitch_document(req.input, spans, results)
+
+
+def _sentence_result(span, res: BatchItemResult) -> SentenceCorrection:
+    start, end, sent = span
+    out = res.result
+    return SentenceCorrection(
+        start=start,
+        end=end,
+        input=sent,
+        # keep the original sentence when its correction failed
+        correction=out.correction if out is not None else sent,
+        reasoning=out.reasoning if out is not None else (res.error or ""),
+        error_type=out.error_type if out is not None else None,
+        status=res.status,
+    )
+
+
+def _stitch_document(text: str, spans, results: List[BatchItemResult]) -> DocumentCorrectionResponse:
+    sentences: List[SentenceCorrection] = []
+    parts: List[str] = []
+    pos = 0
+    for span, res in zip(spans, results):
+        sc = _sentence_result(span, res)
+        parts.append(text[pos : sc.start])
+        parts.append(sc.correction)
+        pos = sc.end
+        sentences.append(sc)
+    parts.append(text[pos:])
+    return DocumentCorrectionResponse(input=text, correction="".join(parts), sentences=sentences)
+
+
+# -- streaming ---------------------------------------------------------------
+
+_STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+def _encode_event(event: str, data, fmt: str) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    if fmt == "sse":
+        return f"event: {event}\ndata: {payload}\n\n"
+    return json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
+
+
+def _streaming(gen: AsyncIterator[str], fmt: str) -> StreamingResponse:
+    if fmt not in _STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    return StreamingResponse(gen, media_type=_STREAM_MEDIA_TYPES[fmt])
+
+
+@app.post("/correct/stream")
+async def correct_stream(req: CorrectionRequest, format: str = "ndjson"):
+    """Stream `correction` and `error_type` as soon as they are parsed from the
+    model output, then `reasoning`, then a final `done` event with the full
+    response. `format` is `ndjson` (default) or `sse`.
+    """
+    return _streaming(_stream_one(req, format), format)
+
+
+async def _stream_one(req: CorrectionRequest, fmt: str) -> AsyncIterator[str]:
+    fields = ("correction", "error_type", "reasoning")
+    hit = cache.lookup_exact(req.input)
+    ctx = EmbeddingContext(req.input)
+    if hit is None and cache.semantic_enabled:
+        vec = await ctx.avector()
+        hit = await run_compute(cache.query_vector, vec)
+    if hit is not None:
+        for f in fields:
+            yield _encode_event(f, {f: getattr(hit, f)}, fmt)
+        yield _encode_event("done", hit.dict(), fmt)
+        return
+
+    use_retrieval = req.use_retrieval and settings.RETRIEVAL_ENABLED
+    top_k = req.top_k or settings.TOP_K
+    k = _neighbour_k(use_retrieval, top_k)
+    results = (await _neighbours([ctx], k))[0] if k > 0 else []
+    retrieved = _shots(results, use_retrieval, top_k)
+    predicted = _triage(results)
+    if triage.skips(predicted):
+        response = _unchanged(req)
+        for f in fields:
+            yield _encode_event(f, {f: getattr(response, f)}, fmt)
+        yield _encode_event("done", response.dict(), fmt)
+        return
+
+    # ask for `correction` first so it can be forwarded before the reasoning is generated
+    prompt = build_prompt(req.input, retrieved, top_k=top_k, correction_first=True)
+    parser = JSONFieldStream()
+    sent = set()
+    try:
+        async for delta in stream_llm_async(prompt, max_tokens=max_tokens_for(req.input)):
+            for key, value in parser.feed(delta).items():
+                if key in fields and key not in sent:
+                    sent.add(key)
+                    yield _encode_event(key, {key: value}, fmt)
+    except Exception as e:
+        logger.exception("LLM stream failed: %s", e)
+
+    response = None
+    if parser.fields.get("correction"):
+        response = CorrectionResponse(
+            input=req.input,
+            reasoning=parser.fields.get("reasoning") or "",
+            correction=parser.fields["correction"],
+            error_type=parser.fields.get("error_type"),
+        )
+        submit_write(cache.upsert, req.input, response, vec=ctx.computed)
+    else:
+        # the stream did not yield a usable object; use the regular (repairing) path
+        try:
+            response = await _generate(req, ctx, retrieved, top_k)
+        except HTTPException as e:
+            yield _encode_event("error", {"status_code": e.status_code, "detail": e.detail}, fmt)
+            return
+    triage.audit(predicted, req.input, response.correction)
+    for f in fields:
+        if f not in sent:
+            yield _encode_event(f, {f: getattr(response, f)}, fmt)
+    yield _encode_event("done", response.dict(), fmt)
+
+
+@app.post("/correct/batch/stream")
+async def correct_batch_stream(batch: BatchCorrectionRequest, format: str = "ndjson"):
+    """Stream each batch item's result as soon as it completes (any order)."""
+
+    async def gen():
+        async for res in _stream_many(batch.items):
+            yield _encode_event("item", res.dict(), format)
+        yield _encode_event("done", {"count": len(batch.items)}, format)
+
+    return _streaming(gen(), format)
+
+
+@app.post("/correct/document/stream")
+async def correct_document_stream(req: DocumentCorrectionRequest, format: str = "ndjson"):
+    """Stream each sentence as it completes, then the stitched document."""
+    spans = split_sentences(req.input)
+    reqs = [CorrectionRequest(input=sent, top_k=req.top_k, use_retrieval=req.use_retrieval) for _, _, sent in spans]
+
+    async def gen():
+        results: List[BatchItemResult | None] = [None] * len(reqs)
+        async for res in _stream_many(reqs):
+            results[res.index] = res
+            yield _encode_event("sentence", _sentence_result(spans[res.index], res).dict(), format)
+        yield _encode_event("done", _stitch_document(req.input, spans, results).dict(), format)
+
+    return _streaming(gen(), format)
+
+
+async def _stream_many(reqs: List[CorrectionRequest]) -> AsyncIterator[BatchItemResult]:
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.ensure_future(_correct_many(reqs, on_result=queue.put_nowait))
+    # sentinel so a failing pipeline cannot leave the consumer waiting forever
+    task.add_done_callback(lambda t: queue.put_nowait(None))
+    try:
+        while True:
+            res = await queue.get()
+            if res is None:
+                break
+            yield res
+        await task
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def _open_support(version: str | None = None) -> VectorStore:
+    path = resolve_version(SUPPORT_INDEX_PATH, version)
+    store = VectorStore(path=path, index_type=settings.SUPPORT_INDEX_TYPE, storage=settings.SUPPORT_STORAGE)
+    store.load(path)
+    if settings.RETRIEVAL_MODE not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown RETRIEVAL_MODE '{settings.RETRIEVAL_MODE}'; expected one of {RETRIEVAL_MODES}")
+    if settings.RETRIEVAL_MODE != "dense":
+        store.lexical = load_lexical(path, store.items)
+    return store
+
+
+def _check_support(store: VectorStore):
+    """Refuse an index built with another embedding model or dimension."""
+    model = store.meta.get("embedding_model")
+    if model and model != settings.EMBEDDING_MODEL:
+        raise ValueError(f"index was built with '{model}', service uses '{settings.EMBEDDING_MODEL}'")
+    if store.dim is not None and store.dim != embedding_dim():
+        raise ValueError(f"index dimension {store.dim} does not match the embedding model ({embedding_dim()})")
+
+
+def _use_support(store: VectorStore):
+    global support_store
+    support_store = store
+    support_version.update(
+        # a store opened from a versions root lives in `<root>/<version>`
+        version=os.path.basename(store.path) if store.path != SUPPORT_INDEX_PATH.rstrip("/") else None,
+        path=store.path,
+        count=store.count(),
+        loaded_at=time.time(),
+    )
+
+
+def _load_support():
+    _use_support(_open_support())
+    readiness["support_index"] = True
+
+
+async def reload_support(version: str | None = None) -> Dict[str, Any]:
+    """Load a support index version (default: the one `CURRENT` names) off the event
+    loop, check it against the embedding model and swap it in."""
+    async with _reload_lock:
+        start = time.perf_counter()
+        store = await run_compute(_open_support, version)
+        await run_compute(_check_support, store)
+        previous = support_version["version"]
+        _use_support(store)
+        logger.info("Support index swapped %s -> %s (%d items, %.2fs)", previous, support_version["version"], store.count(), time.perf_counter() - start)
+        return dict(support_version, previous=previous)
+
+
+async def _tail_cache(interval: float):
+    """Apply cache entries written by other workers (shared `sqlite` cache backend)."""
+    while True:
+        await asyncio.sleep(interval)
+        if not readiness["cache_index"]:
+            continue
+        try:
+            await run_io(cache.sync)
+        except Exception as e:
+            logger.warning("Cache sync failed: %s", e)
+
+
+async def _watch_support_index(interval: float):
+    """Poll the versions root and hot-swap when `CURRENT` changes."""
+    rejected = None
+    while True:
+        await asyncio.sleep(interval)
+        if not readiness["support_index"]:
+            continue
+        version = await run_io(current_version, SUPPORT_INDEX_PATH)
+        if version is None or version == support_version["version"] or version == rejected:
+            continue
+        try:
+            await reload_support(version)
+            rejected = None
+        except Exception as e:
+            rejected = version
+            logger.error("Support index version %s rejected: %s", version, e)
+
+
+def _load_cache():
+    cache.load(CACHE_INDEX_PATH)
+    readiness["cache_index"] = True
+
+
+def _load_model():
+    warm_up()
+    readiness["model"] = True
+
+
+def load_state():
+    """Blocking load of both indexes and the embedding model (for scripts and tests)."""
+    for fn in (_load_support, _load_cache, _load_model):
+        fn()
+
+
+async def _load_in_background():
+    global startup_error
+    start = time.perf_counter()
+    try:
+        # independent loads run in parallel on the compute pool
+        await asyncio.gather(run_compute(_load_support), run_compute(_load_cache), run_compute(_load_model))
+    except Exception as e:
+        startup_error = repr(e)
+        logger.exception("Startup loading failed: %s", e)
+        return
+    logger.info("Service ready in %.2fs", time.perf_counter() - start)
+
+
+def is_ready() -> bool:
+    return startup_error is None and all(readiness.values())
+
+
+@app.on_event("startup")
+async def _start_loading():
+    # not awaited: the app starts serving /healthz and /readyz while loading
+    app.state.loader = asyncio.ensure_future(_load_in_background())
+    if settings.INDEX_WATCH_INTERVAL > 0:
+        app.state.watcher = asyncio.ensure_future(_watch_support_index(settings.INDEX_WATCH_INTERVAL))
+    if cache.backend == "sqlite":
+        app.state.cache_tail = asyncio.ensure_future(_tail_cache(settings.CACHE_SYNC_INTERVAL))
+
+
+@app.middleware("http")
+async def _require_ready(request: Request, call_next):
+    if request.url.path.startswith("/correct") and not is_ready():
+        return JSONResponse({"detail": "service is starting"}, status_code=503, headers={"Retry-After": "1"})
+    return await call_next(request)
+
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: indexes and the embedding model are loaded."""
+    body = {"ready": is_ready(), "components": dict(readiness), "error": startup_error}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+class ReloadRequest(BaseModel):
+    # a version under the SUPPORT_INDEX_PATH root; default: the one CURRENT names
+    version: str | None = None
+
+
+@app.post("/admin/reload-index")
+async def reload_index(req: ReloadRequest | None = None, x_admin_token: str | None = Header(None)):
+    """Hot-swap the support index of this worker (use the watcher to reach every worker)."""
+    if not settings.ADMIN_TOKEN or not hmac.compare_digest(x_admin_token or "", settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="admin token required")
+    try:
+        return await reload_support(req.version if req else None)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.on_event("shutdown")
+async def _flush_background_work():
+    for name in ("watcher", "cache_tail"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    await get_client().close()
+    # wait for queued cache writes before the worker exits
+    shutdown_executors(wait=True)
+    cache.close()
+
+
 @app.get("/metrics")
 def metrics():
-    return {"cache": cache.metrics(), "support_count": len(support_store.items) if support_store.items else 0}
+    return {
+        "cache": cache.metrics(),
+        "embedding": get_batcher().metrics(),
+        "singleflight": inflight.metrics(),
+        "triage": triage.metrics(),
+        "llm": get_client().metrics(),
+        "router": get_router().metrics() if settings.ROUTER_ENABLED else None,
+        "support_count": len(support_store.items) if support_store.items else 0,
+        "support_index": dict(support_version),
+    }
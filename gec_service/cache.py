@@ -1,39 +1,375 @@
-from typing import Optional
+import json
+import time
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
 from .vector_store import VectorStore
+from .cache_log import SQLiteCacheLog
+from .embeddings import embed_text
+from .cache_policy import make_policy
+from .text_utils import text_key
 from .config import settings
 from .models import CorrectionResponse
 
 
 class SemanticCache:
-    def __init__(self, path: str | None = None, threshold: float | None = None):
+    """Bounded two-tier cache: exact match on normalized text, then semantic.
+
+    The exact tier is a dict from a hash of the normalized input (see
+    `text_utils.text_key`) to a cache entry and answers without touching the
+    embedding model; only its misses need a vector search.
+
+    Capacity is limited by entry count and approximate bytes (embedding plus
+    serialized value). Entries may carry a TTL. Evicted and expired entries are
+    tombstoned in the vector store, which is vacuumed once enough rows are dead.
+
+    With the `local` backend the store persists itself (snapshot plus write-ahead
+    log), which suits a single process. With `sqlite` every write also goes to a
+    log shared by all workers (see `cache_log`); the store is an in-memory replica
+    rebuilt from the log on `load` and kept current by `sync`, which evicts down to
+    this worker's caps after applying remote puts.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        threshold: float | None = None,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        ttl: float | None = None,
+        policy: str | None = None,
+        backend: str | None = None,
+        db_path: str | None = None,
+    ):
         self.path = path
-        self.store = VectorStore(path)
+        self.backend = (backend or settings.CACHE_BACKEND).lower()
+        if self.backend not in ("local", "sqlite"):
+            raise ValueError(f"Unknown cache backend '{self.backend}'; expected 'local' or 'sqlite'")
+        self.db_path = db_path or settings.CACHE_DB_PATH
+        # opened on `load`, so constructing the cache touches no files
+        self.log: SQLiteCacheLog | None = None
+        self._log_seq = 0
+        # ids of this worker's puts not yet seen by `sync`
+        self._own: set[int] = set()
+        self._last_prune = time.monotonic()
+        store_path = path if self.backend == "local" else None
+        self.store = VectorStore(store_path, index_type=settings.CACHE_INDEX_TYPE, storage=settings.CACHE_STORAGE)
         self.threshold = threshold or settings.CACHE_THRESHOLD
+        self.max_entries = settings.CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_bytes = settings.CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl = settings.CACHE_TTL_SECONDS if ttl is None else ttl
+        self.policy = make_policy(policy or settings.CACHE_POLICY)
+        self.casefold = settings.EXACT_CACHE_CASEFOLD
+        self.exact_enabled = settings.EXACT_CACHE_ENABLED
+        self.semantic_enabled = settings.SEMANTIC_CACHE_ENABLED
         self.hits = 0
         self.misses = 0
+        self.exact_hits = 0
+        self.exact_misses = 0
+        self.semantic_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+        self._lock = threading.RLock()
+        # entry id -> {"row", "key", "expires_at", "nbytes"}
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        # exact tier: normalized-text key -> entry id
+        self._exact: Dict[str, int] = {}
+        self._next_id = 0
+        self._bytes = 0
+        # (id, row) of expired entries found on the read path; dropped on the next write
+        self._expired: List[Tuple[int, int]] = []
 
     def load(self, path: str):
+        if self.backend == "sqlite":
+            if self.log is None:
+                self.log = SQLiteCacheLog(self.db_path)
+            self.sync()
+            return
         self.store.load(path)
+        with self._lock:
+            self._reindex()
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    def sync(self) -> int:
+        """Apply entries other workers appended to the shared log; returns the record count."""
+        if self.log is None:
+            return 0
+        applied = 0
+        while True:
+            records = self.log.read_since(self._log_seq)
+            if not records:
+                break
+            with self._lock:
+                self._apply(records)
+            applied += len(records)
+        retention = settings.CACHE_LOG_RETENTION_SECONDS
+        if time.monotonic() - self._last_prune > retention / 10:
+            self._last_prune = time.monotonic()
+            self.log.prune(retention)
+        return applied
+
+    def _apply(self, records):
+        now = time.time()
+        items, vecs, pending = [], [], set()
+        for seq, op, entry, item, vec in records:
+            if op == "put":
+                if seq in self._own:
+                    self._own.discard(seq)
+                elif not (item.get("expires_at") and item["expires_at"] <= now):
+                    item["id"] = seq
+                    item["key"] = self._key(item.get("value", {}).get("input", ""))
+                    items.append(item)
+                    vecs.append(vec)
+                    pending.add(seq)
+            elif op == "del" and (entry in self._entries or entry in pending):
+                # rows are only known once pending puts are added
+                if items:
+                    self._add(items, np.stack(vecs))
+                    items, vecs, pending = [], [], set()
+                self.store.delete([self._forget(entry)["row"]])
+            self._log_seq = seq
+        if items:
+            self._add(items, np.stack(vecs))
+        self._evict_to_capacity()
+
+    def _evict_to_capacity(self):
+        """Evict policy victims until the replica is within its caps.
+
+        Remote puts were admitted by the worker that wrote them, so there is no
+        admission check here, and the evictions stay local: each worker bounds
+        its own replica.
+        """
+        dead = []
+        while self._over_capacity(0, 0):
+            victim = self.policy.victim()
+            if victim is None:
+                break
+            dead.append(self._forget(victim)["row"])
+            self.evictions += 1
+        if dead:
+            self.store.delete(dead)
+            self._vacuum_if_needed()
+
+    def _reindex(self):
+        """Rebuild entry bookkeeping from the store's live rows."""
+        self.policy = make_policy(self.policy.name)
+        self._entries.clear()
+        self._exact.clear()
+        self._bytes = 0
+        self._expired = []
+        items = self.store.items
+        self._next_id = max((it.get("id", -1) for it in items), default=-1) + 1
+        live = [(row, it) for row, it in enumerate(items) if not self.store.is_deleted(row)]
+        live.sort(key=lambda r: r[1].get("created_at", 0.0))
+        now = time.time()
+        expired = []
+        for row, item in live:
+            if "id" not in item:
+                # entries written before ids existed
+                item["id"] = self._next_id
+                self._next_id += 1
+            # derive the key from the stored input so normalization settings can change
+            item["key"] = self._key(item.get("value", {}).get("input", ""))
+            if item.get("expires_at") and item["expires_at"] <= now:
+                expired.append(row)
+                continue
+            self._track(item, row)
+        if expired:
+            self.expirations += len(expired)
+            self.store.delete(expired)
+
+    def _add(self, items: List[Dict[str, Any]], vecs: np.ndarray):
+        row = len(self.store.items)
+        # the store appends to its write-ahead log; no full snapshot rewrite here
+        self.store.add_vectors(vecs, items)
+        for i, item in enumerate(items):
+            self._track(item, row + i)
+        self._vacuum_if_needed()
+
+    def _vacuum_if_needed(self):
+        if self.store.needs_vacuum():
+            self.store.vacuum()
+            rows = {it.get("id"): r for r, it in enumerate(self.store.items)}
+            for entry_id, entry in self._entries.items():
+                entry["row"] = rows[entry_id]
+            # expired entries are not tombstoned until the next write, so they moved too
+            self._expired = [(entry_id, rows[entry_id]) for entry_id, _ in self._expired]
+
+    def _key(self, text: str) -> str:
+        return text_key(text, casefold=self.casefold)
+
+    def _track(self, item: Dict[str, Any], row: int):
+        nbytes = self._entry_bytes(item)
+        key = item.get("key", "")
+        self._entries[item["id"]] = {"row": row, "key": key, "expires_at": item.get("expires_at"), "nbytes": nbytes}
+        self._bytes += nbytes
+        self._exact[key] = item["id"]
+        self.policy.insert(item["id"], key)
+
+    def _entry_bytes(self, item: Dict[str, Any]) -> int:
+        return self.store.bytes_per_row() + len(json.dumps(item.get("value", {})))
 
     def query(self, text: str) -> Optional[CorrectionResponse]:
-        results = self.store.query(text, top_k=1)
-        if not results:
-            self.misses += 1
+        hit = self.lookup_exact(text)
+        if hit is not None:
+            return hit
+        if not self.semantic_enabled or self.store.dim is None or self.store.count() == 0:
+            with self._lock:
+                self.misses += 1
             return None
-        item, sim = results[0]
-        if sim >= self.threshold:
+        return self.query_vector(embed_text(text))
+
+    def lookup_exact(self, text: str) -> Optional[CorrectionResponse]:
+        """O(1) exact-tier lookup; records the lookup for frequency-based admission.
+
+        A miss here is not counted as a cache miss: callers fall through to
+        `query_vector`, which accounts for the final outcome.
+        """
+        key = self._key(text)
+        with self._lock:
+            self.policy.record(key)
+            if not self.exact_enabled:
+                return None
+            entry_id = self._exact.get(key)
+            entry = self._entries.get(entry_id) if entry_id is not None else None
+            if entry is None or self._expire_if_stale(entry_id, entry):
+                self.exact_misses += 1
+                return None
+            item = self.store.items[entry["row"]]
+            self.policy.touch(entry_id)
             self.hits += 1
+            self.exact_hits += 1
             return CorrectionResponse(**item["value"])
-        self.misses += 1
-        return None
 
-    def upsert(self, text: str, response: CorrectionResponse):
-        meta = {"value": response.dict()}
-        self.store.add([text], [meta])
-        if self.path:
-            self.store.save(self.path)
+    def _expire_if_stale(self, entry_id: int, entry: Dict[str, Any]) -> bool:
+        if entry["expires_at"] and entry["expires_at"] <= time.time():
+            self._forget(entry_id)
+            self._expired.append((entry_id, entry["row"]))
+            self.expirations += 1
+            return True
+        return False
+
+    def query_vector(self, vec: np.ndarray, text: str | None = None) -> Optional[CorrectionResponse]:
+        """Semantic-tier lookup with an embedding computed once per request.
+
+        Pass `text` when `lookup_exact` was not called, so frequency-based
+        admission (tinylfu) still counts the lookup.
+        """
+        results = self.store.query_vector(vec, top_k=1)
+        return self._resolve(results, text)
+
+    def query_vectors(self, vecs: np.ndarray) -> List[Optional[CorrectionResponse]]:
+        """Semantic-tier lookup for many embeddings with one batched search."""
+        found = self.store.query_batch(np.asarray(vecs, dtype=np.float32), top_k=1)
+        return [self._resolve(results, None) for results in found]
+
+    def _resolve(self, results, text: str | None) -> Optional[CorrectionResponse]:
+        with self._lock:
+            if text is not None:
+                self.policy.record(self._key(text))
+            if not results:
+                self.misses += 1
+                return None
+            item, sim = results[0]
+            entry = self._entries.get(item.get("id"))
+            if sim < self.threshold or entry is None:
+                self.misses += 1
+                return None
+            if self._expire_if_stale(item["id"], entry):
+                self.misses += 1
+                return None
+            self.policy.touch(item["id"])
+            self.hits += 1
+            self.semantic_hits += 1
+            return CorrectionResponse(**item["value"])
+
+    def _forget(self, entry_id: int) -> Dict[str, Any]:
+        entry = self._entries.pop(entry_id)
+        if self._exact.get(entry["key"]) == entry_id:
+            del self._exact[entry["key"]]
+        self._bytes -= entry["nbytes"]
+        self.policy.remove(entry_id)
+        return entry
+
+    def _over_capacity(self, extra_entries: int, extra_bytes: int) -> bool:
+        if self.max_entries and len(self._entries) + extra_entries > self.max_entries:
+            return True
+        if self.max_bytes and self._bytes + extra_bytes > self.max_bytes:
+            return True
+        return False
+
+    def upsert(self, text: str, response: CorrectionResponse, vec: np.ndarray | None = None, ttl: float | None = None):
+        if vec is None:
+            vec = embed_text(text)
+        vec = np.asarray(vec, dtype=np.float32)
+        key = self._key(text)
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            item = {
+                "key": key,
+                "created_at": now,
+                "expires_at": now + ttl if ttl and ttl > 0 else None,
+                "value": response.dict(),
+            }
+            nbytes = self.store.bytes_per_row(vec.size) + len(json.dumps(item["value"]))
+            if self.max_bytes and nbytes > self.max_bytes:
+                self.rejected += 1
+                return
+            dead = self._expired
+            self._expired = []
+            admitted = True
+            while self._over_capacity(1, nbytes):
+                victim = self.policy.victim()
+                if victim is None:
+                    break
+                if not self.policy.admit(key, victim):
+                    self.rejected += 1
+                    admitted = False
+                    break
+                dead.append((victim, self._forget(victim)["row"]))
+                self.evictions += 1
+            if dead:
+                self.store.delete([row for _, row in dead])
+            if admitted and self.log is None:
+                item["id"] = self._next_id
+                self._next_id += 1
+                self._add([item], vec.reshape(1, -1))
+        if self.log is None:
+            return
+        # shared log: written outside the lock so lookups never wait on SQLite
+        self.log.delete([entry_id for entry_id, _ in dead])
+        if admitted:
+            seq = self.log.put(item, vec)
+            with self._lock:
+                # a concurrent `sync` may already have applied it as a remote entry
+                if seq > self._log_seq:
+                    item["id"] = seq
+                    self._own.add(seq)
+                    self._add([item], vec.reshape(1, -1))
 
     def metrics(self):
         total = self.hits + self.misses
         hit_rate = self.hits / total if total > 0 else 0.0
-        return {"hits": self.hits, "misses": self.misses, "hit_rate": hit_rate}
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": hit_rate,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rejected": self.rejected,
+            "policy": self.policy.name,
+            "backend": self.backend,
+            "log_seq": self._log_seq if self.log is not None else None,
+            "tiers": {
+                "exact": {"hits": self.exact_hits, "misses": self.exact_misses, "entries": len(self._exact)},
+                "semantic": {"hits": self.semantic_hits},
+            },
+        }
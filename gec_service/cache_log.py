@@ -0,0 +1,99 @@
+"""Shared change log for `SemanticCache` across worker processes.
+
+Every worker appends its cache writes (`put` with the entry and its embedding,
+`del` for evictions and expirations) to one SQLite database in WAL mode, so
+writers never corrupt each other and readers never see a partial write. The
+log's `seq` is the entry id on every worker; each worker tails records past the
+last `seq` it applied, so entries written by one worker become hits on all.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    entry INTEGER,
+    ts REAL NOT NULL,
+    item TEXT,
+    embedding BLOB
+)
+"""
+
+# (seq, op, entry, item, embedding); `entry` is the put a `del` removes
+Record = Tuple[int, str, int | None, Dict[str, Any] | None, np.ndarray | None]
+
+
+class SQLiteCacheLog:
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        # one connection per process; sqlite3 objects are not safe to share between threads
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(SCHEMA)
+
+    def put(self, item: Dict[str, Any], vec: np.ndarray) -> int:
+        """Append an entry; returns its `seq`, used as the entry id."""
+        blob = np.ascontiguousarray(vec, dtype=np.float32).tobytes()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO cache_log (op, ts, item, embedding) VALUES ('put', ?, ?, ?)",
+                (time.time(), json.dumps(item, ensure_ascii=False), blob),
+            )
+            return int(cur.lastrowid)
+
+    def delete(self, entries: List[int]):
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("INSERT INTO cache_log (op, entry, ts) VALUES ('del', ?, ?)", [(int(e), now) for e in entries])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def read_since(self, seq: int, limit: int = 10000) -> List[Record]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, op, entry, item, embedding FROM cache_log WHERE seq > ? ORDER BY seq LIMIT ?",
+                (seq, limit),
+            ).fetchall()
+        out: List[Record] = []
+        for s, op, entry, item, emb in rows:
+            vec = np.frombuffer(emb, dtype=np.float32) if emb is not None else None
+            out.append((int(s), op, entry, json.loads(item) if item else None, vec))
+        return out
+
+    def prune(self, horizon: float):
+        """Drop puts that were deleted, and deletes older than `horizon` seconds.
+
+        A worker that lags more than `horizon` behind could miss a delete; the
+        horizon should be far above the tail interval.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM cache_log WHERE op = 'put' AND seq IN (SELECT entry FROM cache_log WHERE op = 'del')")
+                self._conn.execute("DELETE FROM cache_log WHERE op = 'del' AND ts < ?", (time.time() - horizon,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
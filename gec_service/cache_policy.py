@@ -0,0 +1,162 @@
+"""Eviction and admission policies for `SemanticCache`.
+
+Policies track cache entry ids (not vector rows) and answer two questions:
+which entry to evict next (`victim`) and whether a new entry should be admitted
+at all when the cache is full (`admit`). `record` is called for every lookup key
+so frequency-based policies can see one-off versus repeated sentences.
+"""
+import hashlib
+from collections import OrderedDict, defaultdict
+from typing import Dict, Hashable
+
+import numpy as np
+
+
+class LRUPolicy:
+    name = "lru"
+
+    def __init__(self):
+        self._order: "OrderedDict[int, None]" = OrderedDict()
+
+    def record(self, key: str):
+        pass
+
+    def insert(self, entry_id: int, key: str):
+        self._order[entry_id] = None
+
+    def touch(self, entry_id: int):
+        if entry_id in self._order:
+            self._order.move_to_end(entry_id)
+
+    def remove(self, entry_id: int):
+        self._order.pop(entry_id, None)
+
+    def victim(self) -> int | None:
+        return next(iter(self._order), None)
+
+    def admit(self, key: str, victim_id: int | None) -> bool:
+        return True
+
+
+class LFUPolicy:
+    """O(1) least-frequently-used; ties are broken by least recent use."""
+
+    name = "lfu"
+
+    def __init__(self):
+        self._freq: Dict[int, int] = {}
+        self._buckets: Dict[int, "OrderedDict[int, None]"] = defaultdict(OrderedDict)
+        self._min = 0
+
+    def record(self, key: str):
+        pass
+
+    def insert(self, entry_id: int, key: str):
+        self._freq[entry_id] = 1
+        self._buckets[1][entry_id] = None
+        self._min = 1
+
+    def touch(self, entry_id: int):
+        f = self._freq.get(entry_id)
+        if f is None:
+            return
+        bucket = self._buckets[f]
+        bucket.pop(entry_id, None)
+        if not bucket:
+            del self._buckets[f]
+            if self._min == f:
+                self._min = f + 1
+        self._freq[entry_id] = f + 1
+        self._buckets[f + 1][entry_id] = None
+
+    def remove(self, entry_id: int):
+        f = self._freq.pop(entry_id, None)
+        if f is None:
+            return
+        bucket = self._buckets[f]
+        bucket.pop(entry_id, None)
+        if not bucket:
+            del self._buckets[f]
+            if self._min == f:
+                self._min = min(self._buckets) if self._buckets else 0
+
+    def victim(self) -> int | None:
+        if not self._freq:
+            return None
+        if self._min not in self._buckets:
+            self._min = min(self._buckets)
+        return next(iter(self._buckets[self._min]))
+
+    def admit(self, key: str, victim_id: int | None) -> bool:
+        return True
+
+
+class CountMinSketch:
+    """Approximate frequency counter with periodic halving (aging)."""
+
+    def __init__(self, width: int = 1 << 16, depth: int = 4, sample_size: int | None = None):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.uint16)
+        self.sample_size = sample_size or 10 * width
+        self._additions = 0
+
+    def _slots(self, key: Hashable):
+        h = hashlib.blake2b(str(key).encode("utf-8"), digest_size=8 * self.depth).digest()
+        return [int.from_bytes(h[8 * i : 8 * i + 8], "little") % self.width for i in range(self.depth)]
+
+    def add(self, key: Hashable):
+        for row, col in enumerate(self._slots(key)):
+            if self.table[row, col] < np.iinfo(np.uint16).max:
+                self.table[row, col] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            # age counts so old popularity fades
+            self.table >>= 1
+            self._additions //= 2
+
+    def estimate(self, key: Hashable) -> int:
+        return int(min(self.table[row, col] for row, col in enumerate(self._slots(key))))
+
+
+class TinyLFUPolicy(LRUPolicy):
+    """LRU eviction guarded by a TinyLFU admission filter.
+
+    When the cache is full a new entry is only admitted if its key has been seen
+    more often than the eviction victim's key, so one-off sentences cannot push
+    out hot ones.
+    """
+
+    name = "tinylfu"
+
+    def __init__(self, width: int = 1 << 16):
+        super().__init__()
+        self.sketch = CountMinSketch(width=width)
+        self._keys: Dict[int, str] = {}
+
+    def record(self, key: str):
+        self.sketch.add(key)
+
+    def insert(self, entry_id: int, key: str):
+        super().insert(entry_id, key)
+        self._keys[entry_id] = key
+
+    def remove(self, entry_id: int):
+        super().remove(entry_id)
+        self._keys.pop(entry_id, None)
+
+    def admit(self, key: str, victim_id: int | None) -> bool:
+        if victim_id is None:
+            return True
+        return self.sketch.estimate(key) > self.sketch.estimate(self._keys.get(victim_id, ""))
+
+
+def make_policy(name: str):
+    name = (name or "lru").lower()
+    if name == "lru":
+        return LRUPolicy()
+    if name == "lfu":
+        return LFUPolicy()
+    if name == "tinylfu":
+        return TinyLFUPolicy()
+    raise ValueError(f"Unknown cache policy '{name}'; expected lru, lfu or tinylfu")
@@ -6,9 +6,117 @@ class Settings(BaseSettings):
     TOP_K: int = 5
     CACHE_THRESHOLD: float = 0.95
     RETRIEVAL_ENABLED: bool = True
+    # few-shot retrieval: dense (embeddings) | lexical (BM25 over support inputs, no embedding
+    # model) | hybrid (reciprocal rank fusion of both, HYBRID_FETCH_K candidates per ranking)
+    RETRIEVAL_MODE: str = "dense"
+    HYBRID_FETCH_K: int = 50
+    RRF_K: int = 60
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    # few-shot selection: stride (the top TOP_K as retrieved) | mmr (maximal marginal relevance
+    # over MMR_FETCH_K candidates; a candidate within MMR_DUPLICATE_THRESHOLD cosine of a picked
+    # shot is dropped, so prompts can carry fewer than TOP_K shots)
+    SHOT_SELECTION: str = "stride"
+    MMR_FETCH_K: int = 20
+    MMR_LAMBDA: float = 0.7
+    MMR_DUPLICATE_THRESHOLD: float = 0.95
+    # semantic cache tier; when off only exact matches are served, and with lexical retrieval
+    # requests never wait on the embedding model (cache writes embed on the writer thread)
+    SEMANTIC_CACHE_ENABLED: bool = True
     OPENAI_MODEL: str = "gpt-4o-mini"
     OPENAI_API_KEY: str | None = None
+    # shared LLM client: concurrency cap, optional rate limit (0 = off), per-attempt timeout
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_RATE_LIMIT_RPS: float = 0.0
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_MAX_ATTEMPTS: int = 2
+    LLM_BACKOFF_BASE: float = 0.25
+    LLM_BACKOFF_MAX: float = 4.0
+    LLM_POOL_SIZE: int = 100
+    # hedged requests: fire a second attempt after the delay (0 = observed p95)
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_DELAY_MS: float = 0.0
+    # LLM answer format: full (echo input + correction) | edits (token edits applied locally)
+    OUTPUT_MODE: str = "full"
+    # minimum completion budgets; both grow with the input length
+    LLM_MAX_TOKENS: int = 256
+    EDITS_MAX_TOKENS: int = 96
+    # tiered routing: comma-separated models (cheapest first); a tier escalates on invalid
+    # output, a token edit ratio above the max, or mean token probability below the min (0 = off)
+    ROUTER_ENABLED: bool = False
+    ROUTER_TIERS: str = "gpt-4o-mini,gpt-4o"
+    ROUTER_MAX_EDIT_RATIO: float = 0.5
+    ROUTER_MIN_CONFIDENCE: float = 0.0
+    # triage fast path: off | shadow (audit only) | on; similarity-weighted kNN vote over
+    # support neighbours whose input equals their correction
+    TRIAGE_MODE: str = "off"
+    TRIAGE_K: int = 10
+    TRIAGE_THRESHOLD: float = 0.9
+    TRIAGE_MIN_SIMILARITY: float = 0.8
+    TRIAGE_MIN_VOTES: int = 3
     INDEX_PATH: str = "./data/index.npz"
+    # store snapshots: a `.npz` file, or a directory (memory-mapped .npy + offset-indexed
+    # items + manifest.json) whose pages are shared by all workers on a host
+    SUPPORT_INDEX_PATH: str = "./data/support_index.npz"
+    CACHE_INDEX_PATH: str = "./data/cache_index.npz"
+    # SUPPORT_INDEX_PATH may also be a versions root (one snapshot per version + a CURRENT
+    # file); each worker polls CURRENT every N seconds and hot-swaps on change (0 = off)
+    INDEX_WATCH_INTERVAL: float = 0.0
+    # required in the X-Admin-Token header of /admin endpoints (unset = admin endpoints disabled)
+    ADMIN_TOKEN: str | None = None
+    # in-memory (and directory snapshot) embedding encoding per store: float32 | float16 | int8;
+    # unset keeps the encoding recorded in the snapshot (float32 for new stores)
+    SUPPORT_STORAGE: str | None = None
+    CACHE_STORAGE: str | None = None
+    # candidates of a pq / ivf_pq search re-scored against the stored rows (0 = off)
+    SEARCH_RERANK_K: int = 32
+    # number of write-ahead log records after which a store snapshot is compacted
+    WAL_COMPACT_EVERY: int = 500
+    # fraction of tombstoned rows that triggers a vacuum (row drop + index rebuild)
+    TOMBSTONE_VACUUM_RATIO: float = 0.2
+    # semantic cache bounds: 0 disables a limit; policy is lru | lfu | tinylfu
+    CACHE_MAX_ENTRIES: int = 100000
+    CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    CACHE_TTL_SECONDS: float = 0.0
+    CACHE_POLICY: str = "lru"
+    # semantic cache persistence: local (snapshot + WAL owned by one process) | sqlite (one
+    # WAL-mode database shared by all workers; each applies the others' writes every N s)
+    CACHE_BACKEND: str = "local"
+    CACHE_DB_PATH: str = "./data/cache.sqlite3"
+    CACHE_SYNC_INTERVAL: float = 1.0
+    # deleted entries are purged from the shared log once older than this
+    CACHE_LOG_RETENTION_SECONDS: float = 3600.0
+    # exact-match tier keyed by normalized text (NFC + whitespace, optional casefold)
+    EXACT_CACHE_ENABLED: bool = True
+    EXACT_CACHE_CASEFOLD: bool = False
+    # thread pools used to keep blocking work off the event loop
+    COMPUTE_WORKERS: int = 4
+    IO_WORKERS: int = 8
+    # nearest-neighbour backend per store: flat | hnsw | ivf_flat | ivf_pq | pq | annoy;
+    # None keeps the type recorded in the snapshot (flat for a new store)
+    SUPPORT_INDEX_TYPE: str | None = None
+    CACHE_INDEX_TYPE: str | None = None
+    HNSW_M: int = 32
+    HNSW_EF_CONSTRUCTION: int = 200
+    HNSW_EF_SEARCH: int = 64
+    IVF_NLIST: int = 1024
+    IVF_NPROBE: int = 16
+    PQ_M: int = 48
+    PQ_NBITS: int = 8
+    ANNOY_TREES: int = 50
+    ANNOY_SEARCH_K: int = -1
+    # rows scored per block by the numpy fallback / batched exact search
+    SEARCH_CHUNK_ROWS: int = 65536
+    # max concurrent LLM calls per batch request
+    BATCH_LLM_CONCURRENCY: int = 8
+    # micro-batching of concurrent query embeddings
+    EMBED_BATCHING: bool = True
+    EMBED_BATCH_WINDOW_MS: float = 3.0
+    EMBED_BATCH_MAX: int = 32
+    # offline precompute: sentences per shard, encoder processes (1 = in-process), encode batch
+    PRECOMPUTE_CHUNK_SIZE: int = 10000
+    PRECOMPUTE_WORKERS: int = 1
+    PRECOMPUTE_BATCH_SIZE: int = 64
 
     class Config:
         env_file = ".env"
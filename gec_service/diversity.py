@@ -0,0 +1,57 @@
+"""Maximal Marginal Relevance selection of few-shot examples.
+
+Retrieval over-fetches `MMR_FETCH_K` candidates together with their stored
+embeddings; MMR then greedily picks shots that are relevant to the query but
+not redundant with the shots already picked:
+
+    argmax_i  lambda * rel(i) - (1 - lambda) * max_{j in picked} cos(i, j)
+
+The candidate similarity matrix is computed once and the running max is
+updated with one vector op per pick, so selection is O(n^2 + k*n) numpy work.
+"""
+from typing import List, Sequence
+import numpy as np
+from .config import settings
+
+
+def mmr(
+    relevance: Sequence[float],
+    embeddings: np.ndarray,
+    k: int,
+    lam: float | None = None,
+    duplicate_threshold: float | None = None,
+) -> List[int]:
+    """Indices of up to `k` candidates in pick order.
+
+    `relevance` is rescaled by its top score, so cosine and BM25 scores weigh
+    the same against redundancy. Candidates whose cosine to a picked shot is at
+    least `duplicate_threshold` are never picked, so fewer than `k` indices may
+    come back when the candidates are near-duplicates.
+    """
+    lam = settings.MMR_LAMBDA if lam is None else lam
+    duplicate_threshold = settings.MMR_DUPLICATE_THRESHOLD if duplicate_threshold is None else duplicate_threshold
+    E = np.array(embeddings, dtype=np.float32, ndmin=2)
+    n = len(E)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    E /= np.maximum(np.linalg.norm(E, axis=1, keepdims=True), 1e-12)
+    rel = np.asarray(relevance, dtype=np.float32)
+    top = float(rel.max())
+    if top > 0:
+        rel = rel / top
+    sim = E @ E.T
+
+    first = int(np.argmax(rel))
+    picked = [first]
+    max_sim = sim[first].copy()
+    open_ = max_sim < duplicate_threshold
+    open_[first] = False
+    while len(picked) < k and open_.any():
+        score = np.where(open_, lam * rel - (1.0 - lam) * max_sim, -np.inf)
+        j = int(np.argmax(score))
+        picked.append(j)
+        np.maximum(max_sim, sim[j], out=max_sim)
+        open_ &= max_sim < duplicate_threshold
+        open_[j] = False
+    return picked
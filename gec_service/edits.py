@@ -0,0 +1,104 @@
+"""Token-level edits: the compact LLM output format.
+
+In edit mode the model sees the input as numbered tokens and answers with a
+list of `[start, end, replacement, type]` edits, where `[start, end)` is a token
+span (`start == end` inserts before token `start`). The corrected sentence is
+rebuilt locally, so the model never has to echo the input or the correction.
+"""
+import re
+from typing import Any, Dict, List, Tuple
+
+_TOKEN_RE = re.compile(r"\w+(?:['’]\w+)*|[^\w\s]")
+# punctuation that attaches to the preceding token when inserted
+_CLOSING = set(".,;:!?)]}%'’”\"")
+
+
+class EditError(ValueError):
+    """Edits that do not fit the input (bad span, overlap, malformed entry)."""
+
+
+def tokenize(text: str) -> List[Tuple[int, int, str]]:
+    """Split into word and punctuation tokens as `(start, end, token)`."""
+    return [(m.start(), m.end(), m.group()) for m in _TOKEN_RE.finditer(text)]
+
+
+def numbered(text: str) -> str:
+    """Render tokens as `0:He 1:go ...` for the edit-mode prompt."""
+    return " ".join(f"{i}:{tok}" for i, (_, _, tok) in enumerate(tokenize(text)))
+
+
+def _as_edit(raw: Any) -> Dict[str, Any]:
+    if isinstance(raw, dict):
+        start, end = raw.get("start"), raw.get("end")
+        replacement = raw.get("replacement", raw.get("replace", raw.get("text", "")))
+        etype = raw.get("type")
+    elif isinstance(raw, (list, tuple)) and 3 <= len(raw) <= 4:
+        start, end, replacement = raw[0], raw[1], raw[2]
+        etype = raw[3] if len(raw) == 4 else None
+    else:
+        raise EditError(f"malformed edit: {raw!r}")
+    if isinstance(start, bool) or isinstance(end, bool) or not isinstance(start, int) or not isinstance(end, int):
+        raise EditError(f"edit span must be integers: {raw!r}")
+    if replacement is None:
+        replacement = ""
+    if not isinstance(replacement, str):
+        raise EditError(f"edit replacement must be a string: {raw!r}")
+    return {"start": start, "end": end, "replacement": replacement.strip(), "type": etype}
+
+
+def validate_edits(text: str, edits: List[Any]) -> List[Dict[str, Any]]:
+    """Normalize edits to dicts sorted by span and check them against `text`.
+
+    Spans must lie within the token range and must not overlap; edits that
+    leave their span unchanged are dropped. Raises `EditError`.
+    """
+    if not isinstance(edits, list):
+        raise EditError("edits must be a list")
+    tokens = tokenize(text)
+    out = []
+    for raw in edits:
+        e = _as_edit(raw)
+        if not 0 <= e["start"] <= e["end"] <= len(tokens):
+            raise EditError(f"edit span {e['start']}:{e['end']} outside 0:{len(tokens)}")
+        if e["start"] == e["end"] and not e["replacement"]:
+            continue
+        if e["start"] < e["end"]:
+            original = text[tokens[e["start"]][0] : tokens[e["end"] - 1][1]]
+            if original == e["replacement"]:
+                continue
+        out.append(e)
+    out.sort(key=lambda e: (e["start"], e["end"]))
+    for prev, cur in zip(out, out[1:]):
+        if cur["start"] < prev["end"] or (cur["start"] == prev["start"] == prev["end"] == cur["end"]):
+            raise EditError(f"overlapping edits at token {cur['start']}")
+    return out
+
+
+def apply_edits(text: str, edits: List[Dict[str, Any]]) -> str:
+    """Rebuild the corrected text from validated edits, keeping original spacing."""
+    tokens = tokenize(text)
+    out = text
+    # right to left so earlier character offsets stay valid
+    for e in reversed(edits):
+        rep = e["replacement"]
+        attach = bool(rep) and rep[0] in _CLOSING
+        if e["start"] == e["end"]:
+            if e["start"] == len(tokens) or (attach and e["start"] > 0):
+                pos = tokens[e["start"] - 1][1] if e["start"] > 0 else len(out)
+                piece = rep if attach else " " + rep
+            else:
+                pos = tokens[e["start"]][0]
+                piece = rep + " "
+            out = out[:pos] + piece + out[pos:]
+            continue
+        s, t = tokens[e["start"]][0], tokens[e["end"] - 1][1]
+        if not rep:
+            # deletion: also drop one adjoining space
+            if t < len(out) and out[t] == " " and (s == 0 or out[s - 1] == " "):
+                t += 1
+            elif s > 0 and out[s - 1] == " ":
+                s -= 1
+        elif attach and s > 0 and out[s - 1] == " " and text[s] not in _CLOSING:
+            s -= 1
+        out = out[:s] + rep + out[t:]
+    return out
@@ -1,25 +1,169 @@
-from sentence_transformers import SentenceTransformer
+import asyncio
+import time
 import numpy as np
 from .config import settings
+from .executors import run_compute
 
 
-_model: SentenceTransformer | None = None
+_model = None
 
 
 def get_model():
     global _model
     if _model is None:
+        # imported here: torch/transformers take seconds to import
+        from sentence_transformers import SentenceTransformer
+
         _model = SentenceTransformer(settings.EMBEDDING_MODEL)
     return _model
 
 
+def embedding_dim() -> int:
+    return int(get_model().get_sentence_embedding_dimension())
+
+
+def warm_up():
+    """Load the model and run one dummy encode so the first request is not slow."""
+    embed_texts(["warm up"])
+
+
 def embed_text(text: str) -> np.ndarray:
     model = get_model()
     emb = model.encode([text], convert_to_numpy=True, normalize_embeddings=True)
     return emb[0]
 
 
-def embed_texts(texts: list[str]) -> np.ndarray:
+def embed_texts(texts: list[str], batch_size: int | None = None) -> np.ndarray:
     model = get_model()
+    if batch_size:
+        return model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
     embs = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
     return embs
+
+
+class EmbeddingContext:
+    """Per-request embedding holder so a text is encoded at most once.
+
+    The vector is computed lazily on first access and then shared by the
+    cache lookup, few-shot retrieval, the failure fallback and the cache upsert.
+    """
+
+    def __init__(self, text: str, vector: np.ndarray | None = None):
+        self.text = text
+        self._vector = vector
+
+    @property
+    def computed(self) -> np.ndarray | None:
+        """The vector if it has been computed already, without encoding."""
+        return self._vector
+
+    @property
+    def vector(self) -> np.ndarray:
+        if self._vector is None:
+            self._vector = embed_text(self.text)
+        return self._vector
+
+    async def avector(self) -> np.ndarray:
+        """Async variant that goes through the micro-batching embedder."""
+        if self._vector is None:
+            if settings.EMBED_BATCHING:
+                self._vector = await get_batcher().embed(self.text)
+            else:
+                self._vector = await run_compute(embed_text, self.text)
+        return self._vector
+
+
+class BatchingEmbedder:
+    """Coalesce concurrent single-text encodes into one batched `encode` call.
+
+    Texts queued within `window_ms` (or until `max_batch` items are waiting) are
+    encoded together on the compute pool and each caller receives its own row.
+    When no batch is running the queue is flushed on the next loop iteration, so
+    low traffic pays no batching delay.
+    """
+
+    def __init__(self, window_ms: float | None = None, max_batch: int | None = None):
+        self.window = (settings.EMBED_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+        self.max_batch = max_batch or settings.EMBED_BATCH_MAX
+        self._pending: list[tuple[str, asyncio.Future, float]] = []
+        self._timer: asyncio.Handle | None = None
+        self._inflight = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # the loop only keeps weak references to tasks; hold running batches until they finish
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def embed(self, text: str) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # futures and timers are bound to a loop; drop state left by a previous one
+            self._pending, self._timer, self._inflight, self._tasks = [], None, 0, set()
+            self._loop = loop
+        fut = loop.create_future()
+        self._pending.append((text, fut, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            delay = 0.0 if self._inflight == 0 else self.window
+            self._timer = loop.call_later(delay, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending[: self.max_batch], self._pending[self.max_batch :]
+        self._inflight += 1
+        task = self._loop.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self._pending:
+            self._timer = self._loop.call_later(self.window, self._flush)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future, float]]):
+        start = time.perf_counter()
+        for _, _, enq in batch:
+            w = start - enq
+            self.wait_total += w
+            self.wait_max = max(self.wait_max, w)
+        self.batches += 1
+        self.items += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        try:
+            embs = await run_compute(embed_texts, [t for t, _, _ in batch])
+        except Exception as e:
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self._inflight -= 1
+        for i, (_, fut, _) in enumerate(batch):
+            if not fut.done():
+                fut.set_result(embs[i])
+
+    def metrics(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "avg_queue_wait_ms": 1000.0 * self.wait_total / self.items if self.items else 0.0,
+            "max_queue_wait_ms": 1000.0 * self.wait_max,
+        }
+
+
+_batcher: BatchingEmbedder | None = None
+
+
+def get_batcher() -> BatchingEmbedder:
+    global _batcher
+    if _batcher is None:
+        _batcher = BatchingEmbedder()
+    return _batcher
@@ -0,0 +1,74 @@
+"""Executor layer that keeps blocking work off the asyncio event loop.
+
+- compute: bounded thread pool for CPU-bound work (embedding, vector search).
+  torch and FAISS release the GIL, so these threads run in parallel.
+- io: thread pool for blocking network calls (the sync LLM fallback).
+- writer: single thread for persistence, so cache writes are serialized and
+  never delay a response.
+"""
+import asyncio
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+from .config import settings
+from .logger import logger
+
+
+_compute: ThreadPoolExecutor | None = None
+_io: ThreadPoolExecutor | None = None
+_writer: ThreadPoolExecutor | None = None
+
+
+def get_compute_executor() -> ThreadPoolExecutor:
+    global _compute
+    if _compute is None:
+        _compute = ThreadPoolExecutor(max_workers=settings.COMPUTE_WORKERS, thread_name_prefix="gec-compute")
+    return _compute
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    global _io
+    if _io is None:
+        _io = ThreadPoolExecutor(max_workers=settings.IO_WORKERS, thread_name_prefix="gec-io")
+    return _io
+
+
+def get_writer() -> ThreadPoolExecutor:
+    global _writer
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gec-writer")
+    return _writer
+
+
+async def run_compute(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run CPU-bound `fn` on the bounded compute pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_compute_executor(), functools.partial(fn, *args, **kwargs))
+
+
+async def run_io(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run blocking I/O-bound `fn` on the io pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def _log_failure(fut: Future):
+    exc = fut.exception()
+    if exc is not None:
+        logger.error("Background write failed: %s", exc, exc_info=exc)
+
+
+def submit_write(fn: Callable[..., Any], *args, **kwargs) -> Future:
+    """Fire-and-forget persistence work on the dedicated writer thread."""
+    fut = get_writer().submit(fn, *args, **kwargs)
+    fut.add_done_callback(_log_failure)
+    return fut
+
+
+def shutdown(wait: bool = True):
+    """Stop all pools; pending writes are flushed when `wait` is true."""
+    global _compute, _io, _writer
+    for ex in (_writer, _compute, _io):
+        if ex is not None:
+            ex.shutdown(wait=wait)
+    _compute = _io = _writer = None
@@ -0,0 +1,335 @@
+"""Pluggable nearest-neighbour index backends for `VectorStore`.
+
+All backends index L2-normalized float32 vectors for inner-product (cosine)
+search and share a small interface: `add` for incremental appends, `search`
+returning FAISS-style `(D, I)` arrays, and `params` describing the build and
+search parameters so they can be stored in the index `meta`.
+
+Available types: `flat` (exact), `hnsw`, `ivf_flat`, `ivf_pq`, `pq` (FAISS)
+and `annoy`. Once trained, the PQ types score approximate codes (`lossy`);
+`VectorStore` re-ranks their candidates against its stored rows.
+"""
+import numpy as np
+from typing import Any, Dict, Tuple
+from .config import settings
+from .logger import logger
+
+# faiss and annoy are imported on first index creation, not at import time,
+# so modules that never build an index stay cheap to import
+faiss = None
+_AnnoyIndex = None
+_HAS_FAISS: bool | None = None
+_HAS_ANNOY: bool | None = None
+
+
+def _load_faiss() -> bool:
+    global faiss, _HAS_FAISS
+    if _HAS_FAISS is None:
+        try:
+            import faiss as _faiss
+            faiss = _faiss
+            _HAS_FAISS = True
+        except Exception:
+            _HAS_FAISS = False
+    return _HAS_FAISS
+
+
+def _load_annoy() -> bool:
+    global _AnnoyIndex, _HAS_ANNOY
+    if _HAS_ANNOY is None:
+        try:
+            from annoy import AnnoyIndex
+            _AnnoyIndex = AnnoyIndex
+            _HAS_ANNOY = True
+        except Exception:
+            _HAS_ANNOY = False
+    return _HAS_ANNOY
+
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "pq", "annoy")
+
+
+def default_params(index_type: str) -> Dict[str, Any]:
+    if index_type == "hnsw":
+        return {"M": settings.HNSW_M, "efConstruction": settings.HNSW_EF_CONSTRUCTION, "efSearch": settings.HNSW_EF_SEARCH}
+    if index_type == "ivf_flat":
+        return {"nlist": settings.IVF_NLIST, "nprobe": settings.IVF_NPROBE}
+    if index_type == "ivf_pq":
+        return {"nlist": settings.IVF_NLIST, "nprobe": settings.IVF_NPROBE, "m": settings.PQ_M, "nbits": settings.PQ_NBITS}
+    if index_type == "pq":
+        return {"m": settings.PQ_M, "nbits": settings.PQ_NBITS}
+    if index_type == "annoy":
+        return {"n_trees": settings.ANNOY_TREES, "search_k": settings.ANNOY_SEARCH_K}
+    return {}
+
+
+class FlatIndex:
+    """Exact inner-product search (`faiss.IndexFlatIP`)."""
+
+    kind = "flat"
+    # scores come from compressed codes rather than the vectors themselves
+    lossy = False
+
+    def __init__(self, dim: int, **params):
+        self.dim = dim
+        self._index = faiss.IndexFlatIP(dim)
+
+    def __len__(self):
+        return self._index.ntotal
+
+    def add(self, embs: np.ndarray):
+        self._index.add(embs)
+
+    def search(self, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self._index.search(q, k)
+
+    def set_search_params(self, **params):
+        pass
+
+    def params(self) -> Dict[str, Any]:
+        return {}
+
+    def to_bytes(self) -> bytes | None:
+        """Serialized index for the directory snapshot format (None if unsupported)."""
+        return faiss.serialize_index(self._index).tobytes()
+
+    def load_bytes(self, data: bytes):
+        self._index = faiss.deserialize_index(np.frombuffer(data, dtype=np.uint8))
+
+
+class HNSWIndex(FlatIndex):
+    """Graph-based ANN (`faiss.IndexHNSWFlat`); supports incremental adds."""
+
+    kind = "hnsw"
+
+    def __init__(self, dim: int, M: int = 32, efConstruction: int = 200, efSearch: int = 64, **params):
+        self.dim = dim
+        self.M = int(M)
+        self._index = faiss.IndexHNSWFlat(dim, self.M, faiss.METRIC_INNER_PRODUCT)
+        self._index.hnsw.efConstruction = int(efConstruction)
+        self._index.hnsw.efSearch = int(efSearch)
+
+    def set_search_params(self, efSearch: int | None = None, **params):
+        if efSearch is not None:
+            self._index.hnsw.efSearch = int(efSearch)
+
+    def params(self) -> Dict[str, Any]:
+        hnsw = self._index.hnsw
+        return {"M": self.M, "efConstruction": int(hnsw.efConstruction), "efSearch": int(hnsw.efSearch)}
+
+
+class IVFIndex(FlatIndex):
+    """Inverted-file ANN (`IndexIVFFlat` or `IndexIVFPQ`).
+
+    IVF needs training data, so vectors are served from an exact flat index until
+    `train_size` rows have been added; the coarse quantizer (and PQ codebooks) are
+    then trained on those rows and the index switches over.
+    """
+
+    def __init__(self, dim: int, nlist: int = 1024, nprobe: int = 16, m: int | None = None, nbits: int = 8, train_size: int | None = None, **params):
+        self.dim = dim
+        self.nlist = int(nlist)
+        self.nprobe = int(nprobe)
+        self.m = int(m) if m else None
+        self.nbits = int(nbits)
+        self.kind = "ivf_pq" if self.m else "ivf_flat"
+        # faiss warns below ~39 points per centroid; PQ codebooks need 2**nbits points
+        self.train_size = int(train_size or max(39 * self.nlist, 2 ** self.nbits if self.m else 0))
+        self._flat = faiss.IndexFlatIP(dim)
+        self._index = None
+
+    def __len__(self):
+        return self._index.ntotal if self._index is not None else self._flat.ntotal
+
+    @property
+    def lossy(self) -> bool:
+        return self.m is not None and self._index is not None
+
+    def _train(self):
+        embs = self._flat.reconstruct_n(0, self._flat.ntotal)
+        quantizer = faiss.IndexFlatIP(self.dim)
+        if self.m:
+            index = faiss.IndexIVFPQ(quantizer, self.dim, self.nlist, self.m, self.nbits, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, self.dim, self.nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(embs)
+        index.add(embs)
+        index.nprobe = self.nprobe
+        # keep the quantizer alive alongside the index (SWIG does not own it)
+        self._quantizer = quantizer
+        self._index = index
+        self._flat = None
+        logger.info("Trained %s index on %d vectors (nlist=%d)", self.kind, len(embs), self.nlist)
+
+    def add(self, embs: np.ndarray):
+        if self._index is not None:
+            self._index.add(embs)
+            return
+        self._flat.add(embs)
+        if self._flat.ntotal >= self.train_size:
+            self._train()
+
+    def search(self, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self._index is None:
+            return self._flat.search(q, k)
+        return self._index.search(q, k)
+
+    def set_search_params(self, nprobe: int | None = None, **params):
+        if nprobe is not None:
+            self.nprobe = int(nprobe)
+            if self._index is not None:
+                self._index.nprobe = self.nprobe
+
+    def to_bytes(self) -> bytes | None:
+        return faiss.serialize_index(self._index if self._index is not None else self._flat).tobytes()
+
+    def load_bytes(self, data: bytes):
+        index = faiss.deserialize_index(np.frombuffer(data, dtype=np.uint8))
+        if isinstance(index, faiss.IndexIVF):
+            index.nprobe = self.nprobe
+            self._index, self._flat = index, None
+        else:
+            # saved before it had enough rows to train
+            self._index, self._flat = None, index
+
+    def params(self) -> Dict[str, Any]:
+        p = {"nlist": self.nlist, "nprobe": self.nprobe, "train_size": self.train_size}
+        if self.m:
+            p.update({"m": self.m, "nbits": self.nbits})
+        return p
+
+
+class PQIndex(IVFIndex):
+    """Exhaustive product-quantized search (`IndexPQ`): `m` sub-codes of `nbits`
+    per vector, no coarse partitioning. Flat until the codebooks can be trained.
+    """
+
+    kind = "pq"
+
+    def __init__(self, dim: int, m: int = 48, nbits: int = 8, train_size: int | None = None, **params):
+        self.dim = dim
+        self.m = int(m)
+        self.nbits = int(nbits)
+        self.train_size = int(train_size or 39 * 2 ** self.nbits)
+        self._flat = faiss.IndexFlatIP(dim)
+        self._index = None
+
+    def _train(self):
+        embs = self._flat.reconstruct_n(0, self._flat.ntotal)
+        index = faiss.IndexPQ(self.dim, self.m, self.nbits, faiss.METRIC_INNER_PRODUCT)
+        index.train(embs)
+        index.add(embs)
+        self._index = index
+        self._flat = None
+        logger.info("Trained pq index on %d vectors (m=%d, nbits=%d)", len(embs), self.m, self.nbits)
+
+    def set_search_params(self, **params):
+        pass
+
+    def load_bytes(self, data: bytes):
+        index = faiss.deserialize_index(np.frombuffer(data, dtype=np.uint8))
+        if isinstance(index, faiss.IndexPQ):
+            self._index, self._flat = index, None
+        else:
+            self._index, self._flat = None, index
+
+    def params(self) -> Dict[str, Any]:
+        return {"m": self.m, "nbits": self.nbits, "train_size": self.train_size}
+
+
+class AnnoyBackend:
+    """Annoy forest index (`metric="dot"`).
+
+    Annoy cannot add items after `build`, so rows appended later are kept in a
+    tail that is scanned exactly and merged with the forest results; the forest
+    is rebuilt once the tail grows past `rebuild_every` rows.
+    """
+
+    kind = "annoy"
+    lossy = False
+
+    def __init__(self, dim: int, n_trees: int = 50, search_k: int = -1, rebuild_every: int | None = None, **params):
+        self.dim = dim
+        self.n_trees = int(n_trees)
+        self.search_k = int(search_k)
+        self.rebuild_every = int(rebuild_every or 1000)
+        self._forest = None
+        self._built = 0
+        self._tail = np.empty((0, dim), dtype=np.float32)
+
+    def __len__(self):
+        return self._built + len(self._tail)
+
+    def _rebuild(self):
+        forest = _AnnoyIndex(self.dim, "dot")
+        i = 0
+        if self._forest is not None:
+            for i in range(self._built):
+                forest.add_item(i, self._forest.get_item_vector(i))
+            i = self._built
+        for j, v in enumerate(self._tail):
+            forest.add_item(i + j, v)
+        forest.build(self.n_trees)
+        self._forest = forest
+        self._built = forest.get_n_items()
+        self._tail = np.empty((0, self.dim), dtype=np.float32)
+
+    def add(self, embs: np.ndarray):
+        self._tail = np.vstack([self._tail, embs])
+        if self._forest is None or len(self._tail) >= max(self.rebuild_every, self._built // 10):
+            self._rebuild()
+
+    def search(self, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        D = np.full((len(q), k), -np.inf, dtype=np.float32)
+        I = np.full((len(q), k), -1, dtype=np.int64)
+        for r, vec in enumerate(q):
+            ids, scores = [], []
+            if self._forest is not None:
+                ids, scores = self._forest.get_nns_by_vector(vec, k, search_k=self.search_k, include_distances=True)
+            if len(self._tail):
+                sims = self._tail @ vec
+                ids = list(ids) + list(range(self._built, self._built + len(sims)))
+                scores = list(scores) + sims.tolist()
+            order = np.argsort(-np.asarray(scores, dtype=np.float32))[:k]
+            D[r, : len(order)] = np.asarray(scores, dtype=np.float32)[order]
+            I[r, : len(order)] = np.asarray(ids, dtype=np.int64)[order]
+        return D, I
+
+    def set_search_params(self, search_k: int | None = None, **params):
+        if search_k is not None:
+            self.search_k = int(search_k)
+
+    def params(self) -> Dict[str, Any]:
+        return {"n_trees": self.n_trees, "search_k": self.search_k, "rebuild_every": self.rebuild_every}
+
+    def to_bytes(self) -> bytes | None:
+        # the forest is rebuilt on load
+        return None
+
+
+def create_index(index_type: str, dim: int, params: Dict[str, Any] | None = None):
+    """Create an empty backend of `index_type`, or None for the numpy fallback."""
+    index_type = (index_type or "flat").lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'; expected one of {INDEX_TYPES}")
+    merged = default_params(index_type)
+    merged.update(params or {})
+    if index_type == "annoy":
+        if _load_annoy():
+            return AnnoyBackend(dim, **merged)
+        logger.warning("annoy not installed; falling back to exact search")
+        index_type = "flat"
+    if not _load_faiss():
+        if index_type != "flat":
+            logger.warning("faiss not installed; '%s' index falls back to numpy brute-force", index_type)
+        return None
+    if index_type == "hnsw":
+        return HNSWIndex(dim, **merged)
+    if index_type == "ivf_flat":
+        merged.pop("m", None)
+        return IVFIndex(dim, **merged)
+    if index_type == "ivf_pq":
+        return IVFIndex(dim, **merged)
+    if index_type == "pq":
+        return PQIndex(dim, **merged)
+    return FlatIndex(dim)
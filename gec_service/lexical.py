@@ -0,0 +1,142 @@
+"""BM25 inverted index over support-set inputs for lexical few-shot retrieval.
+
+Token overlap (the same verb, preposition or article) is often a better
+few-shot signal for GEC than sentence-level semantic similarity, and it needs
+no embedding model. The index is built by `precompute.py` inside a directory
+snapshot (`<index>/lexical.npz`, so a published version carries its own) or
+next to an `.npz` snapshot (`<index>.lexical.npz`). It is row-aligned with the
+store's items, so the store's tombstones apply to it unchanged; a new snapshot
+written to the directory removes it until it is rebuilt.
+
+Postings are kept in CSR form (`ptr`, `docs`, `weights`) with the full BM25
+term weight precomputed per posting, so a query is one scatter-add per term.
+"""
+import json
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Tuple
+import numpy as np
+from .config import settings
+from .logger import logger
+
+# few-shot retrieval modes (`settings.RETRIEVAL_MODE`)
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+
+LEXICAL_FILE = "lexical.npz"
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def terms(text: str) -> List[str]:
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def text_of(item: Dict[str, Any]) -> str:
+    value = item.get("value") or item
+    return value.get("input", "")
+
+
+def lexical_path(index_path: str) -> str:
+    path = index_path.rstrip("/")
+    if path.endswith(".npz"):
+        return path[: -len(".npz")] + ".lexical.npz"
+    return os.path.join(path, LEXICAL_FILE)
+
+
+class LexicalIndex:
+    def __init__(self, vocab: Dict[str, int], ptr: np.ndarray, docs: np.ndarray, weights: np.ndarray, n_docs: int, k1: float, b: float):
+        self.vocab = vocab
+        self.ptr = ptr
+        self.docs = docs
+        self.weights = weights
+        self.n_docs = n_docs
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float | None = None, b: float | None = None) -> "LexicalIndex":
+        k1 = settings.BM25_K1 if k1 is None else k1
+        b = settings.BM25_B if b is None else b
+        vocab: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+        lengths: List[int] = []
+        for d, text in enumerate(texts):
+            toks = terms(text)
+            lengths.append(len(toks))
+            for t, tf in Counter(toks).items():
+                term_ids.append(vocab.setdefault(t, len(vocab)))
+                doc_ids.append(d)
+                tfs.append(tf)
+        n_docs = len(lengths)
+        term_arr = np.asarray(term_ids, dtype=np.int64)
+        docs = np.asarray(doc_ids, dtype=np.int32)
+        tf = np.asarray(tfs, dtype=np.float32)
+        dl = np.asarray(lengths, dtype=np.float32)
+        avgdl = float(dl.mean()) if n_docs else 0.0
+        df = np.bincount(term_arr, minlength=len(vocab)).astype(np.float32)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        norm = k1 * (1.0 - b + b * dl[docs] / max(avgdl, 1e-9))
+        weights = (idf[term_arr] * tf * (k1 + 1.0) / (tf + norm)).astype(np.float32)
+        order = np.argsort(term_arr, kind="stable")
+        ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(df.astype(np.int64), out=ptr[1:])
+        return cls(vocab, ptr, docs[order], weights[order], n_docs, k1, b)
+
+    def search(self, text: str, k: int, exclude=None) -> List[Tuple[int, float]]:
+        """Top-`k` `(row, score)` by BM25, skipping rows in `exclude`."""
+        ids = {self.vocab[t] for t in terms(text) if t in self.vocab}
+        if not ids or k <= 0:
+            return []
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for t in ids:
+            s, e = self.ptr[t], self.ptr[t + 1]
+            # a term has at most one posting per document, so plain fancy-index add is exact
+            scores[self.docs[s:e]] += self.weights[s:e]
+        if exclude:
+            scores[np.fromiter(exclude, dtype=np.int64, count=len(exclude))] = 0.0
+        hit = np.flatnonzero(scores)
+        if len(hit) > k:
+            hit = hit[np.argpartition(-scores[hit], k - 1)[:k]]
+        hit = hit[np.argsort(-scores[hit], kind="stable")]
+        return [(int(r), float(scores[r])) for r in hit]
+
+    def save(self, path: str):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        vocab = sorted(self.vocab, key=self.vocab.get)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                vocab=np.array(json.dumps(vocab, ensure_ascii=False)),
+                ptr=self.ptr,
+                docs=self.docs,
+                weights=self.weights,
+                params=np.array(json.dumps({"n_docs": self.n_docs, "k1": self.k1, "b": self.b})),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        data = np.load(path, allow_pickle=False)
+        vocab = json.loads(str(data["vocab"]))
+        params = json.loads(str(data["params"]))
+        return cls({t: i for i, t in enumerate(vocab)}, data["ptr"], data["docs"], data["weights"], params["n_docs"], params["k1"], params["b"])
+
+
+def load_lexical(index_path: str, items) -> LexicalIndex:
+    """Load the lexical index saved next to `index_path`, rebuilding it from `items`
+    when it is missing or does not match the store's rows."""
+    path = lexical_path(index_path)
+    if os.path.exists(path):
+        lex = LexicalIndex.load(path)
+        if lex.n_docs == len(items):
+            return lex
+        logger.warning("Lexical index %s covers %d rows, store has %d; rebuilding", path, lex.n_docs, len(items))
+    else:
+        logger.info("No lexical index at %s; building from %d items", path, len(items))
+    return LexicalIndex.build(text_of(it) for it in items)
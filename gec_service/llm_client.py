@@ -1,78 +1,129 @@
 import os
 import json
-from typing import Dict
-import openai
+import math
+import difflib
+import time
+import random
+import asyncio
+import re
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, List, Tuple
+import httpx
 from pydantic import ValidationError
 from .config import settings
 from .models import CorrectionResponse
+from .edits import EditError, apply_edits, tokenize, validate_edits
 from .logger import logger
-import asyncio
 
 
+# imported on first use (see `_load_openai`); the SDK is slow to import
+openai = None
+
+
+SYSTEM_MESSAGE = "You are a linguistics expert. Output only a JSON object as specified."
 
-def ensure_api_key():
+
+def _load_openai():
+    global openai
+    if openai is None:
+        import openai as _openai
+        openai = _openai
+    return openai
+
+
+def ensure_api_key() -> str:
+    _load_openai()
     key = settings.OPENAI_API_KEY or os.environ.get("OPENAI_API_KEY")
     if not key:
         raise RuntimeError("OPENAI_API_KEY not set in env or config")
-    openai.api_key = key
+    return key
 
 
-def call_llm(prompt: str, max_tokens: int = 256) -> Dict:
-    ensure_api_key()
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=settings.LLM_POOL_SIZE, max_keepalive_connections=settings.LLM_POOL_SIZE, keepalive_expiry=60)
 
-    def extract_json(text: str) -> dict | None:
-        try:
-            jstart = text.find("{")
-            jend = text.rfind("}")
-            if jstart != -1 and jend != -1:
-                j = json.loads(text[jstart : jend + 1])
-                return j
-        except Exception:
-            return None
+
+def _extract_json(text: str) -> dict | None:
+    try:
+        jstart = text.find("{")
+        jend = text.rfind("}")
+        if jstart != -1 and jend != -1:
+            j = json.loads(text[jstart : jend + 1])
+            return j
+    except Exception:
         return None
+    return None
+
 
-    def normalize_candidate(j: dict) -> dict | None:
+def _normalize_candidate(j: dict) -> dict | None:
+    try:
+        CorrectionResponse(**j)
+        return j
+    except ValidationError:
+        mapped = {
+            "input": j.get("input", ""),
+            "reasoning": j.get("reasoning", j.get("explanation", "")),
+            "correction": j.get("correction", j.get("corrected", "")),
+            "error_type": j.get("error_type", None),
+        }
         try:
-            CorrectionResponse(**j)
-            return j
+            CorrectionResponse(**mapped)
+            return mapped
         except ValidationError:
-            mapped = {
-                "input": j.get("input", ""),
-                "reasoning": j.get("reasoning", j.get("explanation", "")),
-                "correction": j.get("correction", j.get("corrected", "")),
-                "error_type": j.get("error_type", None),
-            }
-            try:
-                CorrectionResponse(**mapped)
-                return mapped
-            except ValidationError:
-                return None
-
-    last_text = ""
-    for attempt in range(2):
-        resp = openai.ChatCompletion.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a linguistics expert. Output only a JSON object as specified."},
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=max_tokens,
-            temperature=0.0,
-        )
-        text = resp["choices"][0]["message"]["content"].strip()
-        last_text = text
-        j = extract_json(text)
-        if j:
-            norm = normalize_candidate(j)
-            if norm:
-                return norm
+            return None
+
+
+def _parse_output(text: str) -> dict | None:
+    j = _extract_json(text)
+    return _normalize_candidate(j) if j else None
+
+
+def _parse_edit_output(text: str, source_text: str) -> dict | None:
+    """Parse an edit-mode answer and rebuild `correction` from `source_text`."""
+    j = _extract_json(text)
+    if not j or "edits" not in j:
+        return None
+    try:
+        edits = validate_edits(source_text, j["edits"])
+    except EditError as e:
+        logger.warning("Rejected LLM edits: %s", e)
+        return None
+    return {
+        "input": source_text,
+        "reasoning": j.get("reasoning") or "",
+        "correction": apply_edits(source_text, edits),
+        "error_type": j.get("error_type"),
+        "edits": edits,
+    }
+
+
+def _repair_prompt(prompt: str, last_text: str, edits: bool = False) -> str:
+    # built from the original prompt each time so retries do not keep growing it
+    keys = "edits, error_type, reasoning; edit spans must use the token numbers shown" if edits else "input, reasoning, correction, error_type"
+    return (
+        prompt
+        + "\n\nThe previous response was not a valid JSON object. Previous output:\n"
+        + last_text
+        + f"\n\nIMPORTANT: Return only a single valid JSON object with keys: {keys}."
+    )
+
+
+def max_tokens_for(text: str, output_mode: str = "full") -> int:
+    """Completion budget that grows with the input instead of a flat cap.
 
-        # repair attempt: ask the model to return only the JSON and include the previous output for context
-        prompt = prompt + "\n\nThe previous response was not a valid JSON object. Previous output:\n" + text + "\n\nIMPORTANT: Return only a single valid JSON object with keys: input, reasoning, correction, error_type."
+    Full mode echoes the input and the correction, so it needs room for two
+    copies of the sentence plus reasoning; edit mode needs a few tokens per
+    edit, bounded by rewriting every token.
+    """
+    n = len(tokenize(text))
+    if output_mode == "edits":
+        return max(settings.EDITS_MAX_TOKENS, 64 + 4 * n)
+    return max(settings.LLM_MAX_TOKENS, 128 + 3 * n)
 
-    # second chance failed: attempt to extract a line after 'Correction:' as fallback
+
+def _fallback_output(last_text: str) -> Dict:
+    # attempt to extract a line after 'Correction:' as fallback
     try:
-        # look for pattern 'Correction:'
         idx = last_text.find("Correction:")
         if idx != -1:
             cand = last_text[idx + len("Correction:"):].strip()
@@ -82,76 +133,526 @@ def call_llm(prompt: str, max_tokens: int = 256) -> Dict:
                 return {"input": "", "reasoning": last_text, "correction": corr, "error_type": None}
     except Exception:
         pass
-
     return {"input": "", "reasoning": last_text if last_text else "", "correction": "", "error_type": None}
 
 
-async def call_llm_async(prompt: str, max_tokens: int = 256) -> Dict:
-    ensure_api_key()
-    def extract_json(text: str) -> dict | None:
-        try:
-            jstart = text.find("{")
-            jend = text.rfind("}")
-            if jstart != -1 and jend != -1:
-                j = json.loads(text[jstart : jend + 1])
-                return j
-        except Exception:
-            return None
+def _confidence(choice) -> float | None:
+    # chat logprobs: {"content": [{"token": ..., "logprob": ...}, ...]}
+    try:
+        lps = [t["logprob"] for t in choice["logprobs"]["content"]]
+    except (KeyError, TypeError):
         return None
+    return math.exp(sum(lps) / len(lps)) if lps else None
 
-    def normalize_candidate(j: dict) -> dict | None:
-        try:
-            CorrectionResponse(**j)
-            return j
-        except ValidationError:
-            mapped = {
-                "input": j.get("input", ""),
-                "reasoning": j.get("reasoning", j.get("explanation", "")),
-                "correction": j.get("correction", j.get("corrected", "")),
-                "error_type": j.get("error_type", None),
-            }
+
+def _messages(prompt: str):
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": prompt},
+    ]
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter (`rate` requests/second, `burst` capacity)."""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.capacity = float(burst or max(1, int(rate)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class LLMClient:
+    """Shared async chat client.
+
+    Owns an `openai.AsyncOpenAI` client on a pooled keep-alive `httpx` client, a
+    global concurrency cap and an optional token-bucket rate limit. SDK retries
+    are off; retries, backoff and timeouts are handled here. Each attempt has its own timeout, failed
+    attempts back off with jitter, and with hedging enabled a second request is
+    fired if the first has not answered after the hedge delay (by default the
+    observed p95 latency); the slower of the two is cancelled.
+
+    `transport` replaces the HTTP transport of both clients (e.g. an
+    `httpx.MockTransport` in tests).
+    """
+
+    def __init__(
+        self,
+        model: str | None = None,
+        max_concurrency: int | None = None,
+        rate_limit: float | None = None,
+        timeout: float | None = None,
+        max_attempts: int | None = None,
+        hedge: bool | None = None,
+        hedge_delay: float | None = None,
+        transport=None,
+    ):
+        self.model = model or settings.OPENAI_MODEL
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.rate_limit = settings.LLM_RATE_LIMIT_RPS if rate_limit is None else rate_limit
+        self.timeout = timeout or settings.LLM_TIMEOUT_SECONDS
+        self.max_attempts = max_attempts or settings.LLM_MAX_ATTEMPTS
+        self.hedge = settings.LLM_HEDGE_ENABLED if hedge is None else hedge
+        if hedge_delay is None and settings.LLM_HEDGE_DELAY_MS > 0:
+            hedge_delay = settings.LLM_HEDGE_DELAY_MS / 1000.0
+        self.hedge_delay = hedge_delay
+        self.transport = transport
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._sem: asyncio.Semaphore | None = None
+        self._bucket: TokenBucket | None = None
+        self._client = None
+        self._sync_client = None
+        self._latencies: deque = deque(maxlen=512)
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    async def _bind_loop(self):
+        # asyncio primitives and pooled async connections belong to one event loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+            self._bucket = TokenBucket(self.rate_limit) if self.rate_limit and self.rate_limit > 0 else None
+            old, self._client = self._client, None
+            if old is not None:
+                try:
+                    await old.close()
+                except Exception as e:
+                    # its connections belong to the previous (usually closed) loop
+                    logger.debug("Closing LLM client of a previous event loop failed: %r", e)
+        if self._client is None:
+            key = ensure_api_key()
+            self._client = openai.AsyncOpenAI(
+                api_key=key,
+                http_client=httpx.AsyncClient(limits=_pool_limits(), transport=self.transport),
+                timeout=self.timeout,
+                max_retries=0,
+            )
+
+    def _bind_sync(self):
+        if self._sync_client is None:
+            key = ensure_api_key()
+            self._sync_client = openai.OpenAI(
+                api_key=key,
+                http_client=httpx.Client(limits=_pool_limits(), transport=self.transport),
+                timeout=self.timeout,
+                max_retries=0,
+            )
+        return self._sync_client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+    def _p95(self) -> float | None:
+        if len(self._latencies) < 20:
+            return None
+        lat = sorted(self._latencies)
+        return lat[int(0.95 * (len(lat) - 1))]
+
+    async def _request(self, prompt: str, max_tokens: int, model: str | None = None, **kwargs):
+        """One rate-limited, concurrency-capped, timed chat request."""
+        await self._bind_loop()
+        async with self._sem:
+            if self._bucket is not None:
+                await self._bucket.acquire()
+            start = time.perf_counter()
+            self.calls += 1
             try:
-                CorrectionResponse(**mapped)
-                return mapped
-            except ValidationError:
-                return None
+                return await asyncio.wait_for(
+                    self._client.chat.completions.create(
+                        model=model or self.model,
+                        messages=_messages(prompt),
+                        max_tokens=max_tokens,
+                        temperature=0.0,
+                        **kwargs,
+                    ),
+                    timeout=self.timeout,
+                )
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+            finally:
+                if not kwargs.get("stream"):
+                    self._latencies.append(time.perf_counter() - start)
 
-    last_text = ""
-    for attempt in range(2):
+    async def _request_hedged(self, prompt: str, max_tokens: int, model: str | None = None, **kwargs):
+        if not self.hedge:
+            return await self._request(prompt, max_tokens, model, **kwargs)
+        delay = self.hedge_delay if self.hedge_delay is not None else self._p95()
+        if delay is None:
+            return await self._request(prompt, max_tokens, model, **kwargs)
+        first = asyncio.ensure_future(self._request(prompt, max_tokens, model, **kwargs))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        self.hedges += 1
+        second = asyncio.ensure_future(self._request(prompt, max_tokens, model, **kwargs))
+        pending = {first, second}
         try:
-            resp = await openai.ChatCompletion.acreate(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are a linguistics expert. Output only a JSON object as specified."},
-                    {"role": "user", "content": prompt},
-                ],
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        if t is second:
+                            self.hedge_wins += 1
+                        return t.result()
+            # both attempts failed: surface the first error
+            return first.result()
+        finally:
+            for t in (first, second):
+                if not t.done():
+                    t.cancel()
+
+    async def chat(self, prompt: str, max_tokens: int = 256, model: str | None = None, **kwargs) -> Tuple[str, Dict]:
+        """Raw completion text plus `{"usage", "confidence"}`, with retries and backoff.
+
+        `confidence` is the geometric-mean token probability when the request
+        asked for `logprobs`, else None.
+        """
+        ensure_api_key()
+        last_exc: Exception | None = None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+            try:
+                resp = (await self._request_hedged(prompt, max_tokens, model, **kwargs)).model_dump()
+                choice = resp["choices"][0]
+                info = {"usage": dict(resp.get("usage") or {}), "confidence": _confidence(choice)}
+                return (choice["message"]["content"] or "").strip(), info
+            except Exception as e:
+                last_exc = e
+                self.failures += 1
+                logger.warning("LLM call failed on attempt %s: %r", attempt, e)
+        raise last_exc
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        base = min(settings.LLM_BACKOFF_MAX, settings.LLM_BACKOFF_BASE * (2 ** (attempt - 1)))
+        return base * random.uniform(0.5, 1.5)
+
+    async def complete(self, prompt: str, max_tokens: int = 256, model: str | None = None, source_text: str | None = None) -> Dict:
+        """Completion parsed into a `CorrectionResponse`-shaped dict.
+
+        With `source_text` the prompt is an edit-mode prompt: the answer's edits
+        are validated against `source_text` and applied to rebuild `correction`.
+
+        An unparseable answer is retried once with a repair instruction; if that
+        fails too, the `Correction:` line fallback is used.
+        """
+        norm, last_text, _ = await self.complete_detailed(prompt, max_tokens, model, source_text)
+        return norm or _fallback_output(last_text)
+
+    async def complete_detailed(
+        self,
+        prompt: str,
+        max_tokens: int = 256,
+        model: str | None = None,
+        source_text: str | None = None,
+        rounds: int = 2,
+        **kwargs,
+    ) -> Tuple[dict | None, str, Dict]:
+        """Parsed output (or None), the last raw text, and summed usage/confidence
+        over up to `rounds` parse/repair rounds.
+
+        Repair rounds are only spent on unparseable answers; once `chat` has
+        used up its retries on a transport error or timeout, the caller falls
+        back instead of starting another round.
+        """
+        last_text = ""
+        attempt_prompt = prompt
+        info: Dict = {"usage": {}, "confidence": None}
+        for attempt in range(rounds):
+            try:
+                text, meta = await self.chat(attempt_prompt, max_tokens, model, **kwargs)
+            except Exception as e:
+                logger.exception("LLM async call failed on attempt %s: %s", attempt, e)
+                break
+            for k, v in meta["usage"].items():
+                if isinstance(v, (int, float)):
+                    info["usage"][k] = info["usage"].get(k, 0) + v
+            info["confidence"] = meta["confidence"]
+            last_text = text
+            norm = self._parse(text, source_text)
+            if norm:
+                return norm, text, info
+            attempt_prompt = _repair_prompt(prompt, text, edits=source_text is not None)
+        return None, last_text, info
+
+    @staticmethod
+    def _parse(text: str, source_text: str | None) -> dict | None:
+        if source_text is not None:
+            return _parse_edit_output(text, source_text)
+        return _parse_output(text)
+
+    async def stream(self, prompt: str, max_tokens: int = 256, model: str | None = None) -> AsyncIterator[str]:
+        """Yield content deltas from a streamed chat completion."""
+        ensure_api_key()
+        resp = await self._request(prompt, max_tokens, model, stream=True)
+        async for chunk in resp:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+    def complete_sync(self, prompt: str, max_tokens: int = 256, model: str | None = None, source_text: str | None = None) -> Dict:
+        """Blocking variant for callers without an event loop."""
+        client = self._bind_sync()
+        last_text = ""
+        attempt_prompt = prompt
+        for attempt in range(2):
+            resp = client.chat.completions.create(
+                model=model or self.model,
+                messages=_messages(attempt_prompt),
                 max_tokens=max_tokens,
                 temperature=0.0,
             )
-        except Exception as e:
-            logger.exception("LLM async call failed on attempt %s: %s", attempt, e)
-            continue
-        try:
-            text = resp["choices"][0]["message"]["content"].strip()
+            text = (resp.choices[0].message.content or "").strip()
             last_text = text
-            j = extract_json(text)
-            if j:
-                norm = normalize_candidate(j)
-                if norm:
-                    return norm
-        except Exception:
-            pass
-        prompt = prompt + "\n\nThe previous response was not a valid JSON object. Previous output:" + "\n" + last_text + "\n\nIMPORTANT: Return only a single valid JSON object with keys: input, reasoning, correction, error_type."
-
-    # fallback: try to extract 'Correction:' line
-    try:
-        idx = last_text.find("Correction:")
-        if idx != -1:
-            cand = last_text[idx + len("Correction:"):].strip()
-            corr = cand.splitlines()[0].strip(' \"')
-            if corr:
-                return {"input": "", "reasoning": last_text, "correction": corr, "error_type": None}
-    except Exception:
-        pass
+            norm = self._parse(text, source_text)
+            if norm:
+                return norm
+            # repair attempt: ask the model to return only the JSON and include the previous output for context
+            attempt_prompt = _repair_prompt(prompt, text, edits=source_text is not None)
+        return _fallback_output(last_text)
 
-    return {"input": "", "reasoning": last_text if last_text else "", "correction": "", "error_type": None}
+    def metrics(self):
+        lat = sorted(self._latencies)
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p50_ms": 1000.0 * lat[len(lat) // 2] if lat else None,
+            "p95_ms": 1000.0 * lat[int(0.95 * (len(lat) - 1))] if lat else None,
+        }
+
+
+_client: LLMClient | None = None
+
+
+def get_client() -> LLMClient:
+    global _client
+    if _client is None:
+        _client = LLMClient()
+    return _client
+
+
+class ModelRouter:
+    """Cheapest-first model routing with escalation.
+
+    `tiers` are tried in order (e.g. a small model, then the large one). A tier
+    is either a model name served by the shared `LLMClient` or a local stand-in
+    registered with `register_local` (a callable `(prompt, source_text) -> dict
+    | None`, sync or async). The answer of a non-final tier is accepted unless
+
+    - it does not parse/validate as a `CorrectionResponse` (no repair round is
+      spent on cheap tiers, the next tier is the repair),
+    - the correction rewrites more than `max_edit_ratio` of the input tokens, or
+    - its confidence (mean token probability, requested as `logprobs`) is
+      below `min_confidence`.
+
+    Per-tier request, escalation, latency and token counts are kept for /metrics.
+    """
+
+    def __init__(
+        self,
+        tiers: List[str] | None = None,
+        client: LLMClient | None = None,
+        max_edit_ratio: float | None = None,
+        min_confidence: float | None = None,
+    ):
+        if tiers is None:
+            tiers = [t.strip() for t in settings.ROUTER_TIERS.split(",") if t.strip()]
+        self.tiers = tiers or [settings.OPENAI_MODEL]
+        self.client = client or get_client()
+        self.max_edit_ratio = settings.ROUTER_MAX_EDIT_RATIO if max_edit_ratio is None else max_edit_ratio
+        self.min_confidence = settings.ROUTER_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        self._local: Dict[str, Callable] = {}
+        self._stats = {t: self._new_stats() for t in self.tiers}
+        self.requests = 0
+
+    @staticmethod
+    def _new_stats():
+        return {
+            "requests": 0,
+            "accepted": 0,
+            "escalations": 0,
+            "failures": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "latencies": deque(maxlen=512),
+            "reasons": {"invalid": 0, "edit_distance": 0, "low_confidence": 0},
+        }
+
+    def register_local(self, name: str, fn: Callable):
+        """Serve tier `name` with a local callable instead of the API."""
+        self._local[name] = fn
+
+    async def _call_tier(self, tier: str, prompt: str, max_tokens: int, source_text: str | None, final: bool):
+        if tier in self._local:
+            out = self._local[tier](prompt, source_text)
+            if asyncio.iscoroutine(out):
+                out = await out
+            return (self.client._parse(json.dumps(out), source_text) if isinstance(out, dict) else None), "", {"usage": {}, "confidence": None}
+        kwargs = {"logprobs": True} if self.min_confidence > 0 and not final else {}
+        return await self.client.complete_detailed(prompt, max_tokens, tier, source_text, rounds=2 if final else 1, **kwargs)
+
+    def _reject_reason(self, norm: dict | None, info: Dict, source_text: str | None, input_text: str | None) -> str | None:
+        if not norm or not norm.get("correction"):
+            return "invalid"
+        original = source_text or input_text or norm.get("input") or ""
+        if original and self.max_edit_ratio > 0 and edit_ratio(original, norm["correction"]) > self.max_edit_ratio:
+            return "edit_distance"
+        conf = info.get("confidence")
+        if self.min_confidence > 0 and conf is not None and conf < self.min_confidence:
+            return "low_confidence"
+        return None
+
+    async def complete(
+        self,
+        prompt: str,
+        max_tokens: int = 256,
+        source_text: str | None = None,
+        input_text: str | None = None,
+    ) -> Dict:
+        """Like `LLMClient.complete`, escalating through the tiers as needed.
+
+        `input_text` is the sentence being corrected (needed for the edit
+        distance check in full output mode; edit mode uses `source_text`).
+        """
+        self.requests += 1
+        norm, last_text = None, ""
+        for i, tier in enumerate(self.tiers):
+            final = i == len(self.tiers) - 1
+            st = self._stats[tier]
+            st["requests"] += 1
+            start = time.perf_counter()
+            try:
+                norm, text, info = await self._call_tier(tier, prompt, max_tokens, source_text, final)
+            except Exception as e:
+                logger.warning("Router tier %s failed: %r", tier, e)
+                norm, text, info = None, "", {"usage": {}, "confidence": None}
+                st["failures"] += 1
+            st["latencies"].append(time.perf_counter() - start)
+            st["prompt_tokens"] += info["usage"].get("prompt_tokens", 0)
+            st["completion_tokens"] += info["usage"].get("completion_tokens", 0)
+            last_text = text or last_text
+            reason = None if final else self._reject_reason(norm, info, source_text, input_text)
+            if reason is None and norm:
+                st["accepted"] += 1
+                return norm
+            if not final:
+                st["escalations"] += 1
+                st["reasons"][reason or "invalid"] += 1
+        return norm or _fallback_output(last_text)
+
+    def metrics(self):
+        tiers = {}
+        for tier, st in self._stats.items():
+            lat = sorted(st["latencies"])
+            tiers[tier] = {
+                "requests": st["requests"],
+                "accepted": st["accepted"],
+                "escalations": st["escalations"],
+                "escalation_rate": st["escalations"] / st["requests"] if st["requests"] else 0.0,
+                "failures": st["failures"],
+                "prompt_tokens": st["prompt_tokens"],
+                "completion_tokens": st["completion_tokens"],
+                "reasons": dict(st["reasons"]),
+                "p50_ms": 1000.0 * lat[len(lat) // 2] if lat else None,
+                "p95_ms": 1000.0 * lat[int(0.95 * (len(lat) - 1))] if lat else None,
+                "local": tier in self._local,
+            }
+        escalated = self._stats[self.tiers[0]]["escalations"]
+        return {
+            "requests": self.requests,
+            "escalation_rate": escalated / self.requests if self.requests else 0.0,
+            "tiers": tiers,
+        }
+
+
+def edit_ratio(source: str, target: str) -> float:
+    """Token-level edit distance of `target` from `source`, relative to the source length."""
+    a = [t for _, _, t in tokenize(source)]
+    b = [t for _, _, t in tokenize(target)]
+    if not a:
+        return 0.0 if not b else 1.0
+    matched = sum(block.size for block in difflib.SequenceMatcher(None, a, b, autojunk=False).get_matching_blocks())
+    return (max(len(a), len(b)) - matched) / len(a)
+
+
+_router: ModelRouter | None = None
+
+
+def get_router() -> ModelRouter:
+    global _router
+    if _router is None:
+        _router = ModelRouter()
+    return _router
+
+
+def call_llm(prompt: str, max_tokens: int = 256, source_text: str | None = None) -> Dict:
+    return get_client().complete_sync(prompt, max_tokens=max_tokens, source_text=source_text)
+
+
+async def call_llm_async(prompt: str, max_tokens: int = 256, source_text: str | None = None, input_text: str | None = None) -> Dict:
+    if settings.ROUTER_ENABLED:
+        return await get_router().complete(prompt, max_tokens=max_tokens, source_text=source_text, input_text=input_text)
+    return await get_client().complete(prompt, max_tokens=max_tokens, source_text=source_text)
+
+
+async def stream_llm_async(prompt: str, max_tokens: int = 256) -> AsyncIterator[str]:
+    """Yield content deltas from a streamed chat completion."""
+    async for delta in get_client().stream(prompt, max_tokens=max_tokens):
+        yield delta
+
+
+_FIELD_RE = re.compile(r'"(\w+)"\s*:\s*("(?:[^"\\]|\\.)*"|null)')
+
+
+class JSONFieldStream:
+    """Incrementally extract completed top-level string fields from streamed JSON.
+
+    `feed` returns the fields whose values became complete with this chunk, so a
+    caller can forward `correction` before the rest of the object has arrived.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.fields: Dict[str, str | None] = {}
+
+    def feed(self, delta: str) -> Dict[str, str | None]:
+        self.text += delta
+        new: Dict[str, str | None] = {}
+        for m in _FIELD_RE.finditer(self.text):
+            key = m.group(1)
+            if key in self.fields:
+                continue
+            try:
+                value = json.loads(m.group(2))
+            except json.JSONDecodeError:
+                continue
+            self.fields[key] = value
+            new[key] = value
+        return new
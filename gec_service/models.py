@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 
 class CorrectionRequest(BaseModel):
@@ -8,8 +8,57 @@ class CorrectionRequest(BaseModel):
     use_retrieval: bool = True
 
 
+class Edit(BaseModel):
+    # token span [start, end) of the input, see `edits.tokenize`
+    start: int
+    end: int
+    replacement: str
+    type: Optional[str] = None
+
+
 class CorrectionResponse(BaseModel):
     input: str
     reasoning: str
     correction: str
     error_type: Optional[str] = None
+    # set when the answer came from edit mode (OUTPUT_MODE=edits)
+    edits: Optional[List[Edit]] = None
+
+
+class BatchCorrectionRequest(BaseModel):
+    items: List[CorrectionRequest]
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    # "ok" (corrected by the LLM), "cached", "triaged" (predicted correct, no LLM call) or "error"
+    status: str
+    result: Optional[CorrectionResponse] = None
+    error: Optional[str] = None
+
+
+class BatchCorrectionResponse(BaseModel):
+    results: List[BatchItemResult]
+
+
+class DocumentCorrectionRequest(BaseModel):
+    input: str
+    top_k: int | None = None
+    use_retrieval: bool = True
+
+
+class SentenceCorrection(BaseModel):
+    # character offsets of the sentence in the original input
+    start: int
+    end: int
+    input: str
+    correction: str
+    reasoning: str = ""
+    error_type: Optional[str] = None
+    status: str
+
+
+class DocumentCorrectionResponse(BaseModel):
+    input: str
+    correction: str
+    sentences: List[SentenceCorrection]
@@ -1,4 +1,7 @@
 from typing import List, Dict
+import numpy as np
+from .diversity import mmr
+from .edits import numbered
 
 
 SYSTEM_PROMPT = (
@@ -8,32 +11,91 @@ SYSTEM_PROMPT = (
 )
 
 
-def build_prompt(input_text: str, retrieved: List[Dict], top_k: int = 5, max_chars: int | None = None) -> str:
+EDITS_SYSTEM_PROMPT = (
+    "You are an expert linguist. Follow MaxMatch standard.\n"
+    "Given Input as numbered tokens, list the minimal token edits that correct it.\n"
+    "Output MUST be a single valid JSON object and nothing else with fields: `edits`, `error_type`, `reasoning`."
+)
+
+
+EDITS_TASK = (
+    "Please provide:\n"
+    "1) `edits`: a list of [start, end, replacement, type] where tokens start..end-1 are replaced "
+    "by `replacement` (start == end inserts before token start, \"\" deletes). Use [] if the input is correct.\n"
+    "2) An `error_type` label (VT/PREP/DET/SVA/etc.) for the main error, or null.\n"
+    "3) `reasoning`: one short sentence at most.\n\n"
+    "Return only the JSON object."
+)
+
+
+STREAM_ORDER_HINT = (
+    "\nEmit the JSON keys in this order: `correction`, `error_type`, `reasoning`, `input`."
+)
+
+
+def select_shots(retrieved: List[Dict], k: int) -> List[Dict]:
+    """Up to `k` examples from `retrieved`.
+
+    Candidates that carry `score` and `embedding` (SHOT_SELECTION=mmr) are picked
+    by MMR; otherwise roughly evenly spaced examples are taken.
+    """
+    sel = list(retrieved or [])
+    if k <= 0 or not sel:
+        return []
+    if all("embedding" in r for r in sel):
+        order = mmr([r.get("score", 0.0) for r in sel], np.stack([r["embedding"] for r in sel]), k)
+        return [sel[i] for i in order]
+    if len(sel) > k:
+        # pick roughly evenly spaced examples to maximize diversity
+        stride = max(1, len(sel) // k)
+        sel = [sel[i] for i in range(0, len(sel), stride)][:k]
+    return sel
+
+
+def format_shot(r: Dict) -> str:
+    v = r.get("value") or r
+    return f"Example Input: {v.get('input')}\nReasoning: {v.get('reasoning')}\nCorrection: {v.get('correction')}\nError Type: {v.get('error_type')}\n"
+
+
+def build_prompt(
+    input_text: str,
+    retrieved: List[Dict],
+    top_k: int = 5,
+    max_chars: int | None = None,
+    correction_first: bool = False,
+    output_mode: str = "full",
+) -> str:
     """Build a CoT prompt including up to `top_k` retrieved examples.
 
+    `retrieved` may hold more candidates than `top_k`; see `select_shots`.
+
     If `max_chars` is provided, attempt to keep the prompt length <= max_chars by
     reducing the number of retrieved examples (diversity selection) and, if needed,
     truncating the reference examples section while preserving the Task and Input.
+
+    With `correction_first` the model is asked to emit `correction` and
+    `error_type` before `reasoning`, so a streaming client can render the
+    corrected sentence as soon as it is generated.
+
+    With `output_mode="edits"` the input is shown as numbered tokens and the
+    model answers with token edits only (see `edits.py`), which needs far fewer
+    completion tokens than echoing the whole sentence.
     """
-    # select up to top_k examples, attempt diversity by spacing if more available
-    sel = list(retrieved or [])
-    if len(sel) > top_k:
-        # pick roughly evenly spaced examples to maximize diversity
-        stride = max(1, len(sel) // top_k)
-        sel = [sel[i] for i in range(0, len(sel), stride)][:top_k]
+    if output_mode == "edits":
+        system = EDITS_SYSTEM_PROMPT
+        task = f"Task:\nInput: {input_text}\nTokens: {numbered(input_text)}\n\n{EDITS_TASK}"
+    else:
+        order_hint = STREAM_ORDER_HINT if correction_first else ""
+        system = SYSTEM_PROMPT
+        task = f"Task:\nInput: {input_text}\n\nPlease provide:\n1) A `reasoning` section that explains the grammatical issue.\n2) A `correction` section with the corrected sentence.\n3) An `error_type` label (VT/PREP/DET/SVA/etc.).\n\nReturn only the JSON object.{order_hint}"
 
-    shots: List[str] = []
-    for r in sel:
-        v = r.get("value") or r
-        example = (
-            f"Example Input: {v.get('input')}\nReasoning: {v.get('reasoning')}\nCorrection: {v.get('correction')}\nError Type: {v.get('error_type')}\n"
-        )
-        shots.append(example)
+    # select up to top_k examples (MMR when candidates carry embeddings, else spaced out)
+    shots: List[str] = [format_shot(r) for r in select_shots(retrieved, top_k)]
 
     ref_section = "" if not shots else "Reference Examples:\n" + "\n".join(shots) + "\n"
 
     prompt = (
-        f"{SYSTEM_PROMPT}\n\n{ref_section}Task:\nInput: {input_text}\n\nPlease provide:\n1) A `reasoning` section that explains the grammatical issue.\n2) A `correction` section with the corrected sentence.\n3) An `error_type` label (VT/PREP/DET/SVA/etc.).\n\nReturn only the JSON object."
+        f"{system}\n\n{ref_section}{task}"
     )
 
     if max_chars is None:
@@ -48,18 +110,16 @@ def build_prompt(input_text: str, retrieved: List[Dict], top_k: int = 5, max_cha
         if k == 0:
             candidate_ref = ""
         else:
-            stride = max(1, len(retrieved) // k)
-            sel2 = [retrieved[i] for i in range(0, len(retrieved), stride)][:k]
-            shots2 = [f"Example Input: { (r.get('value') or r).get('input')}\nReasoning: {(r.get('value') or r).get('reasoning')}\nCorrection: {(r.get('value') or r).get('correction')}\nError Type: {(r.get('value') or r).get('error_type')}\n" for r in sel2]
+            shots2 = [format_shot(r) for r in select_shots(retrieved, k)]
             candidate_ref = "Reference Examples:\n" + "\n".join(shots2) + "\n"
 
-        candidate = f"{SYSTEM_PROMPT}\n\n{candidate_ref}Task:\nInput: {input_text}\n\nPlease provide:\n1) A `reasoning` section that explains the grammatical issue.\n2) A `correction` section with the corrected sentence.\n3) An `error_type` label (VT/PREP/DET/SVA/etc.).\n\nReturn only the JSON object."
+        candidate = f"{system}\n\n{candidate_ref}{task}"
         if len(candidate) <= max_chars:
             return candidate
 
     # as last resort, truncate the reference section to fit
     # keep Task and Input intact
-    base = f"{SYSTEM_PROMPT}\n\nTask:\nInput: {input_text}\n\nPlease provide:\n1) A `reasoning` section that explains the grammatical issue.\n2) A `correction` section with the corrected sentence.\n3) An `error_type` label (VT/PREP/DET/SVA/etc.).\n\nReturn only the JSON object."
+    base = f"{system}\n\n{task}"
     # truncate base if it's still longer than max_chars
     if len(base) <= max_chars:
         # prepend as much of reference examples as fits
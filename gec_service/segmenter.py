@@ -0,0 +1,85 @@
+"""Lightweight sentence segmentation with character offsets.
+
+Rule-based on purpose (no model download): a sentence ends at `.`, `!` or `?`
+(plus any closing quotes/brackets) followed by whitespace, or at a blank line.
+Common abbreviations and name initials do not end a sentence; words that are
+also ordinary words ("no", "est") only count as abbreviations before a number
+("No. 5", "est. 1990"), and a single capital letter only counts as an initial
+when another initial or a surname follows ("J. K. Rowling", not "Plan B. Then").
+"""
+import re
+from typing import List, Tuple
+
+_ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e",
+    "fig", "vol", "approx", "dept", "inc", "ltd", "jan", "feb",
+    "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}
+
+# abbreviations only when a number follows: "The answer is no. She left." is two sentences
+_NUMERIC_ABBREVIATIONS = {"no", "est"}
+
+_NUMBER_AHEAD = re.compile(r"\s*\d")
+
+# what may follow an initial: another initial or a capitalized name
+_NAME_AHEAD = re.compile(r"\s+(?:[A-Z]\.|([A-Z][\w'’-]*))")
+
+# capitalized words that start a new sentence rather than continue a name
+_SENTENCE_STARTERS = {
+    "A", "An", "The", "This", "That", "These", "Those", "There", "Then", "Now",
+    "I", "He", "She", "It", "We", "They", "You", "My", "His", "Her", "Our", "Their",
+    "But", "And", "So", "Or", "Yet", "If", "When", "While", "After", "Before",
+    "In", "On", "At", "For", "As", "However", "Later", "Finally",
+}
+
+_BOUNDARY = re.compile(r"[.!?]+[\"'”’)\]]*(?=\s)|\n\s*\n")
+
+
+def _is_abbreviation(text: str, end: int) -> bool:
+    # token immediately before the period, e.g. "Dr" in "Dr. Smith"
+    m = re.search(r"(\S+)\.$", text[:end])
+    if not m:
+        return False
+    raw = m.group(1).lstrip("(\"'")
+    token = raw.lower()
+    if token in _NUMERIC_ABBREVIATIONS:
+        return _NUMBER_AHEAD.match(text, end) is not None
+    if len(raw) == 1:
+        return raw.isupper() and _is_initial(text, end)
+    return token in _ABBREVIATIONS
+
+
+def _is_initial(text: str, end: int) -> bool:
+    ahead = _NAME_AHEAD.match(text, end)
+    if not ahead:
+        return False
+    word = ahead.group(1)
+    return word is None or word not in _SENTENCE_STARTERS
+
+
+def split_sentences(text: str) -> List[Tuple[int, int, str]]:
+    """Split `text` into `(start, end, sentence)` spans with `text[start:end] == sentence`.
+
+    Leading/trailing whitespace is excluded from each span, so stitching
+    corrections back with the original gaps preserves the layout.
+    """
+    spans: List[Tuple[int, int, str]] = []
+    start = 0
+    for m in _BOUNDARY.finditer(text):
+        end = m.end()
+        if m.group().endswith(".") and _is_abbreviation(text, end):
+            continue
+        spans.append((start, end))
+        start = end
+    spans.append((start, len(text)))
+
+    out: List[Tuple[int, int, str]] = []
+    for s, e in spans:
+        seg = text[s:e]
+        stripped = seg.strip()
+        if not stripped:
+            continue
+        s += len(seg) - len(seg.lstrip())
+        e = s + len(stripped)
+        out.append((s, e, stripped))
+    return out
@@ -0,0 +1,42 @@
+"""Single-flight coalescing of identical in-flight async work.
+
+The first caller for a key (the leader) starts the work as its own task; callers
+arriving with the same key while it runs (followers) await that task instead of
+repeating it. The work is shielded, so a leader whose client disconnects does not
+cancel it for the followers.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # mark the exception retrieved even if every waiter went away
+            task.exception()
+
+    def metrics(self):
+        return {
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "saved_calls": self.followers,
+            "in_flight": len(self._inflight),
+        }
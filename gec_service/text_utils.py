@@ -0,0 +1,14 @@
+"""Text normalization shared by the cache tiers and request coalescing."""
+import hashlib
+import unicodedata
+
+
+def normalize_text(text: str, casefold: bool = False) -> str:
+    """Unicode NFC, collapse runs of whitespace, strip; optionally case-fold."""
+    norm = " ".join(unicodedata.normalize("NFC", text).split())
+    return norm.casefold() if casefold else norm
+
+
+def text_key(text: str, casefold: bool = False) -> str:
+    """Stable hash of the normalized text, used as an exact-match key."""
+    return hashlib.sha1(normalize_text(text, casefold=casefold).encode("utf-8")).hexdigest()
@@ -0,0 +1,117 @@
+"""Triage: predict sentences that are already correct and skip the LLM for them.
+
+The prediction is a similarity-weighted nearest-neighbour vote over the support
+set, where a neighbour votes "no change" when its `input` equals its
+`correction`. It reuses the neighbours fetched for few-shot retrieval, so it
+costs no extra model call or search.
+
+Modes: `off`; `shadow` (decide and audit against the LLM answer, but always
+call the LLM); `on` (return `correction == input` when the vote passes the
+threshold).
+"""
+import threading
+from typing import Any, Dict, List, Tuple
+from .config import settings
+from .logger import logger
+from .text_utils import normalize_text
+
+MODES = ("off", "shadow", "on")
+
+
+def is_unchanged(value: Dict[str, Any]) -> bool:
+    return normalize_text(value.get("input") or "") == normalize_text(value.get("correction") or "")
+
+
+class Triage:
+    def __init__(
+        self,
+        mode: str | None = None,
+        k: int | None = None,
+        threshold: float | None = None,
+        min_similarity: float | None = None,
+        min_votes: int | None = None,
+    ):
+        self.mode = (mode or settings.TRIAGE_MODE).lower()
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown triage mode '{self.mode}'; expected one of {MODES}")
+        self.k = k or settings.TRIAGE_K
+        self.threshold = settings.TRIAGE_THRESHOLD if threshold is None else threshold
+        self.min_similarity = settings.TRIAGE_MIN_SIMILARITY if min_similarity is None else min_similarity
+        self.min_votes = min_votes or settings.TRIAGE_MIN_VOTES
+        self._lock = threading.Lock()
+        self.decisions = 0
+        self.predicted_correct = 0
+        self.skipped = 0
+        # shadow audit against the LLM answer
+        self.audit_agree = 0
+        self.audit_false_skip = 0
+        self.audit_missed = 0
+        self.audit_total = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def vote(self, neighbours: List[Tuple[Dict[str, Any], float]]) -> float | None:
+        """Similarity-weighted share of "no change" neighbours, or None if too few qualify."""
+        total = unchanged = 0.0
+        votes = 0
+        for item, sim in neighbours[: self.k]:
+            if sim < self.min_similarity:
+                continue
+            value = item.get("value") or item
+            total += sim
+            votes += 1
+            if is_unchanged(value):
+                unchanged += sim
+        if votes < self.min_votes or total <= 0:
+            return None
+        return unchanged / total
+
+    def decide(self, neighbours: List[Tuple[Dict[str, Any], float]]) -> bool | None:
+        """True if the sentence is predicted correct; None when triage is off."""
+        if not self.enabled:
+            return None
+        p = self.vote(neighbours)
+        predicted = p is not None and p >= self.threshold
+        with self._lock:
+            self.decisions += 1
+            if predicted:
+                self.predicted_correct += 1
+                if self.mode == "on":
+                    self.skipped += 1
+        return predicted
+
+    def skips(self, predicted: bool | None) -> bool:
+        return bool(predicted) and self.mode == "on"
+
+    def audit(self, predicted: bool | None, text: str, correction: str):
+        """Shadow mode: compare the prediction with what the LLM actually did."""
+        if self.mode != "shadow" or predicted is None:
+            return
+        unchanged = normalize_text(text) == normalize_text(correction)
+        with self._lock:
+            self.audit_total += 1
+            if predicted == unchanged:
+                self.audit_agree += 1
+            elif predicted:
+                self.audit_false_skip += 1
+                logger.info("triage shadow: predicted correct but LLM changed %r -> %r", text, correction)
+            else:
+                self.audit_missed += 1
+
+    def metrics(self):
+        return {
+            "mode": self.mode,
+            "decisions": self.decisions,
+            "predicted_correct": self.predicted_correct,
+            "skipped": self.skipped,
+            "skip_rate": self.predicted_correct / self.decisions if self.decisions else 0.0,
+            "audit": {
+                "total": self.audit_total,
+                "agree": self.audit_agree,
+                "false_skip": self.audit_false_skip,
+                "missed": self.audit_missed,
+                "false_skip_rate": self.audit_false_skip / self.audit_total if self.audit_total else 0.0,
+            },
+        }
@@ -1,87 +1,795 @@
 import os
+import re
+import glob
 import json
+import base64
+import threading
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from typing import Any, Callable, Dict, List, Tuple
 from .embeddings import embed_text, embed_texts
+from .config import settings
+from .logger import logger
+from .index_backends import create_index
+from .quantization import make_codec
+from .lexical import LEXICAL_FILE, LexicalIndex, text_of
 
-try:
-    import faiss
-    _HAS_FAISS = True
-except Exception:
-    _HAS_FAISS = False
+
+def normalize_rows(x: np.ndarray) -> np.ndarray:
+    """L2-normalize rows in place (same result as `faiss.normalize_L2`)."""
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    x /= np.maximum(norms, 1e-12)
+    return x
+
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+# data files a directory snapshot writes (sequence-numbered); only these, files named
+# by the previous manifest and the lexical sidecar are ever removed from the directory
+SNAPSHOT_FILE_RE = re.compile(r"^(embeddings|offsets|deleted)\.\d+\.npy$|^items\.\d+\.jsonl$|^index\.\d+\.faiss$")
+
+
+def is_dir_format(path: str) -> bool:
+    """Directory snapshots are used for any path that is not a `.npz` file."""
+    return os.path.isdir(path) or not path.endswith(".npz")
+
+
+# Versioned indexes: a root directory holding one snapshot per version plus a
+# `CURRENT` file naming the live one. Publishing a version rewrites `CURRENT`
+# atomically; readers resolve the root to the version it names.
+CURRENT = "CURRENT"
+
+
+def current_version(root: str) -> str | None:
+    try:
+        with open(os.path.join(root, CURRENT), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def resolve_version(root: str, version: str | None = None) -> str:
+    """Snapshot path for `version` (default: `CURRENT`) of a versioned root; other paths are returned as is."""
+    root = root.rstrip("/")
+    version = version or current_version(root)
+    if version is None:
+        return root
+    if os.path.basename(version) != version or version in (".", ".."):
+        raise ValueError(f"Invalid index version '{version}'")
+    path = os.path.join(root, version)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Index version '{version}' not found under {root}")
+    return path
+
+
+def publish_version(root: str, version: str):
+    """Point `root/CURRENT` at `version` (a snapshot already written under `root`)."""
+    resolve_version(root, version)
+    tmp = os.path.join(root, CURRENT + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, CURRENT))
+
+
+class MappedItems:
+    """List-like view of items stored as JSON lines in a memory-mapped file.
+
+    `offsets[i]:offsets[i + 1]` is the byte range of item `i`. Items are decoded
+    on first access and then kept, so in-place edits stick; appended items are
+    held in a plain list. Worker processes mapping the same file share its pages.
+    """
+
+    def __init__(self, data_path: str, offsets: np.ndarray):
+        self._offsets = offsets
+        n = int(offsets[-1]) if len(offsets) else 0
+        self._raw = np.memmap(data_path, dtype=np.uint8, mode="r", shape=(n,)) if n else np.empty(0, dtype=np.uint8)
+        self._base = max(0, len(offsets) - 1)
+        self._decoded: Dict[int, Dict[str, Any]] = {}
+        self._extra: List[Dict[str, Any]] = []
+
+    def __len__(self):
+        return self._base + len(self._extra)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if i >= self._base:
+            return self._extra[i - self._base]
+        item = self._decoded.get(i)
+        if item is None:
+            start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+            item = json.loads(self._raw[start:end].tobytes())
+            self._decoded[i] = item
+        return item
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, item: Dict[str, Any]):
+        self._extra.append(item)
+
+    def extend(self, items):
+        self._extra.extend(items)
+
+
+def topk_inner_product(
+    embs: np.ndarray,
+    Q: np.ndarray,
+    k: int,
+    chunk_rows: int = 65536,
+    query_chunk: int = 256,
+    decode: Callable[[np.ndarray], np.ndarray] | None = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact top-k by inner product with FAISS-style `(D, I)` output.
+
+    Scores are computed one (query chunk x row chunk) block at a time and reduced
+    with `np.argpartition`, so a full Q x N similarity matrix is never held.
+    Missing slots (k > N) are padded with -inf / -1. `decode` converts a block of
+    stored rows (e.g. int8 codes) to float32 before scoring.
+    """
+    n = embs.shape[0]
+    nq = Q.shape[0]
+    D = np.full((nq, k), -np.inf, dtype=np.float32)
+    I = np.full((nq, k), -1, dtype=np.int64)
+    if n == 0 or k <= 0:
+        return D, I
+    for qs in range(0, nq, query_chunk):
+        qc = Q[qs : qs + query_chunk]
+        best_d = np.full((len(qc), 0), -np.inf, dtype=np.float32)
+        best_i = np.empty((len(qc), 0), dtype=np.int64)
+        for rs in range(0, n, chunk_rows):
+            block = embs[rs : rs + chunk_rows]
+            block = decode(block) if decode is not None else np.asarray(block, dtype=np.float32)
+            sims = qc @ block.T
+            kk = min(k, sims.shape[1])
+            part = np.argpartition(-sims, kk - 1, axis=1)[:, :kk]
+            cand_d = np.concatenate([best_d, np.take_along_axis(sims, part, axis=1)], axis=1)
+            cand_i = np.concatenate([best_i, part + rs], axis=1)
+            if cand_d.shape[1] > k:
+                keep = np.argpartition(-cand_d, k - 1, axis=1)[:, :k]
+                cand_d = np.take_along_axis(cand_d, keep, axis=1)
+                cand_i = np.take_along_axis(cand_i, keep, axis=1)
+            best_d, best_i = cand_d, cand_i
+        order = np.argsort(-best_d, axis=1)
+        m = best_d.shape[1]
+        D[qs : qs + len(qc), :m] = np.take_along_axis(best_d, order, axis=1)
+        I[qs : qs + len(qc), :m] = np.take_along_axis(best_i, order, axis=1)
+    return D, I
 
 
 class VectorStore:
     """Vector store that uses FAISS if available, otherwise falls back to numpy brute-force.
 
     Stores items (meta) aligned with embeddings. Provides save/load to disk.
+
+    Appends are incremental: embeddings live in a buffer grown with amortized
+    capacity, only new rows are added to the index, and when `path` is set each
+    append is written to a write-ahead log (`<path>.wal`) instead of rewriting the
+    snapshot. The log is folded into the snapshot by a background compaction.
+
+    `index_type` selects the search backend (see `index_backends`); when omitted
+    the type recorded in a loaded index's `meta["index"]` is used, else `flat`.
+
+    Rows are removed with `delete`, which only records tombstones (searches skip
+    them); `vacuum` drops tombstoned rows and rebuilds the index. Both are logged
+    to the write-ahead log so replay reproduces the same row numbering.
+
+    `storage` selects how rows are held in memory (`float32`, `float16`, `int8`,
+    see `quantization`); when omitted the storage recorded in a loaded snapshot
+    is used, else `float32`. With a PQ index (`pq`, `ivf_pq`) the top `rerank_k`
+    candidates are re-scored from the stored rows, so similarity thresholds
+    compare cosines at storage precision (exact for `float32`) rather than PQ
+    estimates.
     """
 
-    def __init__(self, path: str | None = None):
-        self.path = path
-        self.embeddings: np.ndarray | None = None
+    def __init__(
+        self,
+        path: str | None = None,
+        compact_every: int | None = None,
+        index_type: str | None = None,
+        index_params: Dict[str, Any] | None = None,
+        storage: str | None = None,
+        rerank_k: int | None = None,
+    ):
+        self.path = path.rstrip("/") if path else path
+        self.index_type = index_type
+        self.index_params = dict(index_params or {})
+        self.storage = storage
+        self._codec = make_codec(storage)
+        self.rerank_k = settings.SEARCH_RERANK_K if rerank_k is None else rerank_k
         self.items: List[Dict[str, Any]] = []
         self.meta: Dict[str, Any] = {}
+        self.compact_every = compact_every or settings.WAL_COMPACT_EVERY
+        self._buf: np.ndarray | None = None
+        self._size = 0
         self._index = None
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        # last WAL sequence number applied in memory / contained in the snapshot
+        self._seq = 0
+        self._wal_pending = 0
+        self._compacting = False
+        self._tombstones: set[int] = set()
+        # flat stores loaded from a directory snapshot search the shared memory-mapped
+        # matrix directly instead of copying it into a private FAISS index
+        self._exact_scan = False
+        # optional row-aligned `lexical.LexicalIndex` over item inputs, attached by the loader
+        self.lexical = None
+
+    @property
+    def embeddings(self) -> np.ndarray | None:
+        """Stored rows as float32 (a view for float32 storage, a decoded copy otherwise)."""
+        if self._buf is None:
+            return None
+        return self._codec.decode(self._buf[: self._size])
+
+    @embeddings.setter
+    def embeddings(self, value: np.ndarray | None):
+        if value is None:
+            self._buf, self._size = None, 0
+            return
+        self._buf = self._codec.encode(value)
+        self._size = self._buf.shape[0]
+
+    @property
+    def dim(self) -> int | None:
+        return None if self._buf is None else self._codec.dim(self._buf.shape[1])
+
+    def bytes_per_row(self, dim: int | None = None) -> int:
+        dim = dim or self.dim or 0
+        return self._codec.bytes_per_row(dim)
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """Approximate bytes held for the stored rows and the search index."""
+        rows = self._size * self.bytes_per_row() if self._buf is not None else 0
+        index = 0
+        if self._index is not None:
+            data = self._index.to_bytes()
+            index = len(data) if data is not None else rows
+        return {"rows": rows, "index": index, "total": rows + index}
+
+    def _adopt_storage(self, name: str | None):
+        # a snapshot's storage applies unless the caller chose one explicitly
+        if self.storage is None and name:
+            self._codec = make_codec(name)
+
+    def _lossy_scores(self) -> bool:
+        # hnsw / ivf_flat / annoy (and PQ types before training) score the float32 vectors
+        # they hold and a flat scan scores the stored rows; only PQ codes gain from re-scoring
+        return self._index is not None and self._index.lossy
+
+    def _index_config(self) -> Tuple[str, Dict[str, Any]]:
+        saved = self.meta.get("index") or {}
+        index_type = self.index_type or saved.get("type") or "flat"
+        params = dict(saved.get("params") or {}) if saved.get("type") == index_type else {}
+        params.update(self.index_params)
+        return index_type, params
+
+    def _new_index(self, dim: int):
+        index_type, params = self._index_config()
+        if index_type == "flat" and (self._exact_scan or self._codec.name != "float32"):
+            # exact search reads the stored rows directly; a FAISS flat index would be a float32 copy
+            return None
+        return create_index(index_type, dim, params)
 
     def _build_index(self):
-        if self.embeddings is None:
+        if self._buf is None:
             return
-        if _HAS_FAISS:
-            dim = self.embeddings.shape[1]
-            self._index = faiss.IndexFlatIP(dim)
-            faiss.normalize_L2(self.embeddings)
-            self._index.add(self.embeddings)
-        else:
-            self._index = None
+        rows = self._buf[: self._size]
+        if self._codec.name == "float32" and rows.flags.writeable:
+            # memory-mapped snapshots are read-only and were normalized when saved
+            normalize_rows(rows)
+        self._index = self._new_index(self.dim)
+        if self._index is not None:
+            step = settings.SEARCH_CHUNK_ROWS
+            for start in range(0, self._size, step):
+                self._index.add(self._codec.decode(rows[start : start + step]))
+
+    def set_search_params(self, **params):
+        """Tune search-time parameters (`efSearch`, `nprobe`, `search_k`) in place."""
+        self.index_params.update(params)
+        if self._index is not None:
+            self._index.set_search_params(**params)
+
+    def index_info(self) -> Dict[str, Any]:
+        index_type, params = self._index_config()
+        if self._index is not None:
+            return {"type": self._index.kind, "params": self._index.params()}
+        return {"type": index_type, "params": params}
+
+    def _append_rows(self, embs: np.ndarray):
+        n, dim = embs.shape
+        embs = normalize_rows(np.array(embs, dtype=np.float32))
+        codes = self._codec.encode(embs)
+        width = codes.shape[1]
+        if self._buf is None:
+            self._buf = np.empty((max(n, 16), width), dtype=self._codec.dtype)
+        elif self._size + n > self._buf.shape[0]:
+            # grow geometrically so appends are amortized O(1) per row
+            cap = max(self._size + n, 2 * self._buf.shape[0])
+            buf = np.empty((cap, width), dtype=self._codec.dtype)
+            buf[: self._size] = self._buf[: self._size]
+            self._buf = buf
+        self._buf[self._size : self._size + n] = codes
+        if self._index is None:
+            self._index = self._new_index(dim)
+        if self._index is not None:
+            self._index.add(embs)
+        self._size += n
+
+    def vectors(self, rows: List[int]) -> np.ndarray:
+        """Stored rows `rows` as float32 (decoded copies)."""
+        with self._lock:
+            return self._codec.decode(self._buf[np.asarray(rows, dtype=np.int64)])
+
+    def count(self) -> int:
+        """Number of live (non-deleted) rows."""
+        return len(self.items) - len(self._tombstones)
+
+    def is_deleted(self, row: int) -> bool:
+        return row in self._tombstones
 
     def add(self, texts: List[str], metas: List[Dict[str, Any]]):
         embs = embed_texts(texts)
-        if self.embeddings is None:
-            self.embeddings = embs
+        self.add_vectors(embs, metas)
+
+    def add_vectors(self, embs: np.ndarray, metas: List[Dict[str, Any]]):
+        """Add precomputed (normalized) embeddings aligned with `metas`."""
+        embs = np.asarray(embs, dtype=np.float32).reshape(len(metas), -1)
+        with self._lock:
+            self._append_rows(embs)
+            self.items.extend(metas)
+            if self.path:
+                self._seq += 1
+                self._wal_pending += 1
+                self._wal_append(self.path, {"seq": self._seq, "op": "add", "items": metas}, embs)
+        if self.path:
+            self._maybe_compact()
+
+    def delete(self, rows: List[int]):
+        """Tombstone `rows`; they are skipped by searches until `vacuum` drops them."""
+        with self._lock:
+            rows = sorted({int(r) for r in rows if 0 <= int(r) < self._size} - self._tombstones)
+            if not rows:
+                return
+            self._tombstones.update(rows)
+            if self.path:
+                self._seq += 1
+                self._wal_pending += 1
+                self._wal_append(self.path, {"seq": self._seq, "op": "del", "rows": rows})
+        if self.path:
+            self._maybe_compact()
+
+    def needs_vacuum(self) -> bool:
+        n = len(self._tombstones)
+        return n > 0 and n >= settings.TOMBSTONE_VACUUM_RATIO * max(1, len(self.items))
+
+    def vacuum(self):
+        """Physically drop tombstoned rows and rebuild the index (renumbers rows)."""
+        with self._lock:
+            if not self._tombstones:
+                return
+            self._drop_tombstones()
+            if self.path:
+                self._seq += 1
+                self._wal_pending += 1
+                self._wal_append(self.path, {"seq": self._seq, "op": "vacuum"})
+        if self.path:
+            self._maybe_compact()
+
+    def _drop_tombstones(self):
+        keep = np.ones(self._size, dtype=bool)
+        keep[list(self._tombstones)] = False
+        if keep.any():
+            self._buf = self._buf[: self._size][keep]
+            self._size = self._buf.shape[0]
         else:
-            self.embeddings = np.vstack([self.embeddings, embs])
-        self.items.extend(metas)
+            self._buf, self._size = None, 0
+        self.items = [it for it, k in zip(self.items, keep) if k]
+        self._tombstones.clear()
+        if self.lexical is not None:
+            # row-aligned, so it is renumbered with the store
+            self.lexical = LexicalIndex.build(text_of(it) for it in self.items)
+        self._index = None
         self._build_index()
-        if self.path:
-            self.save(self.path)
 
     def query(self, text: str, top_k: int = 5) -> List[Tuple[Dict[str, Any], float]]:
-        if (self.embeddings is None or len(self.items) == 0):
+        if self._size == 0 or len(self.items) == 0:
             return []
-        q = embed_text(text)
-        if _HAS_FAISS and self._index is not None:
-            vec = q.reshape(1, -1).astype('float32')
-            faiss.normalize_L2(vec)
-            D, I = self._index.search(vec, top_k)
-            results = []
-            for idx, score in zip(I[0], D[0]):
-                if idx < 0:
-                    continue
-                results.append((self.items[int(idx)], float(score)))
-            return results
-
-        embs = self.embeddings
-        sims = embs @ q
-        idx = np.argsort(-sims)[:top_k]
-        return [(self.items[int(i)], float(sims[int(i)])) for i in idx]
-
-    def save(self, path: str):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        # include optional metadata
-        meta_str = json.dumps(self.meta) if getattr(self, "meta", None) is not None else json.dumps({})
-        np.savez_compressed(path, embeddings=self.embeddings, items=json.dumps(self.items), meta=meta_str)
+        return self.query_vector(embed_text(text), top_k=top_k)
 
-    def load(self, path: str):
-        if not os.path.exists(path):
-            return
-        data = np.load(path, allow_pickle=True)
-        self.embeddings = data["embeddings"]
-        self.items = json.loads(str(data["items"].tolist()))
-        # load optional metadata if present
+    def query_vector(self, vec: np.ndarray, top_k: int = 5) -> List[Tuple[Dict[str, Any], float]]:
+        """Query with an already computed embedding (see `EmbeddingContext`)."""
+        if self._size == 0 or len(self.items) == 0:
+            return []
+        q = np.asarray(vec, dtype=np.float32).reshape(1, -1)
+        return self.query_batch(q, top_k=top_k)[0]
+
+    def _hits(self, hits: List[Tuple[int, float]], with_vectors: bool = False) -> List[tuple]:
+        """`(item, score)` per `(row, score)`, plus the stored row with `with_vectors`; call under the lock."""
+        items = self.items
+        if not with_vectors:
+            return [(items[r], s) for r, s in hits]
+        if not hits:
+            return []
+        vecs = self._codec.decode(self._buf[np.asarray([r for r, _ in hits], dtype=np.int64)])
+        return [(items[r], s, v) for (r, s), v in zip(hits, vecs)]
+
+    def query_batch(self, queries, top_k: int = 5, chunk_rows: int | None = None, with_vectors: bool = False) -> List[List[Tuple[Dict[str, Any], float]]]:
+        """Top-k search for many queries at once.
+
+        `queries` is a list of texts (embedded in one batch) or a 2-D array of
+        embeddings. Returns one `[(item, score), ...]` list per query, for both the
+        index backend and the numpy fallback; `with_vectors` adds each hit's stored
+        embedding as a third element.
+        """
+        if isinstance(queries, np.ndarray):
+            Q = np.array(queries, dtype=np.float32, ndmin=2)
+        else:
+            queries = list(queries)
+            if not queries:
+                return []
+            if self._size == 0 or len(self.items) == 0:
+                return [[] for _ in queries]
+            Q = np.asarray(embed_texts(queries), dtype=np.float32)
+        if self._size == 0 or len(self.items) == 0:
+            return [[] for _ in range(len(Q))]
+        norms = np.linalg.norm(Q, axis=1, keepdims=True)
+        Q = Q / np.where(norms > 0, norms, 1.0)
+        with self._lock:
+            return [self._hits(hits, with_vectors) for hits in self._search(Q, top_k, chunk_rows)]
+
+    def _search(self, Q: np.ndarray, top_k: int, chunk_rows: int | None = None) -> List[List[Tuple[int, float]]]:
+        """Top-k live `(row, score)` per normalized query row."""
+        with self._lock:
+            dead = self._tombstones
+            max_k = min(top_k + len(dead), self._size)
+            k = min(top_k + min(len(dead), top_k), self._size)
+            rerank = self.rerank_k > 0 and self._lossy_scores()
+            while True:
+                fetch = min(max(k, self.rerank_k), self._size) if rerank else k
+                if self._index is not None:
+                    D, I = self._index.search(Q, fetch)
+                else:
+                    decode = None if self._codec.name == "float32" else self._codec.decode
+                    D, I = topk_inner_product(self._buf[: self._size], Q, fetch, chunk_rows=chunk_rows or settings.SEARCH_CHUNK_ROWS, decode=decode)
+                if rerank:
+                    D, I = self._rerank(Q, I, k)
+                results = [
+                    [(int(i), float(d)) for d, i in zip(drow, irow) if i >= 0 and int(i) not in dead][:top_k]
+                    for drow, irow in zip(D, I)
+                ]
+                # widen the search only if tombstones crowded out live rows
+                if k >= max_k or all(len(r) >= top_k for r in results):
+                    return results
+                k = min(2 * k, max_k)
+
+    def query_lexical(self, texts: List[str], top_k: int = 5, with_vectors: bool = False) -> List[List[Tuple[Dict[str, Any], float]]]:
+        """BM25 neighbours from the attached lexical index; scores are BM25, not cosine."""
+        if self.lexical is None:
+            raise RuntimeError("no lexical index attached to this store")
+        with self._lock:
+            dead = self._tombstones
+            return [self._hits(self.lexical.search(t, top_k, exclude=dead), with_vectors) for t in texts]
+
+    def query_hybrid(
+        self, texts: List[str], vecs: np.ndarray, top_k: int = 5, fetch_k: int | None = None, rrf_k: int | None = None, with_vectors: bool = False
+    ) -> List[List[Tuple[Dict[str, Any], float]]]:
+        """Reciprocal rank fusion of the dense and lexical rankings.
+
+        Results are in fused order; each score is the item's cosine similarity to
+        the query (computed from the stored row for lexical-only candidates), so
+        similarity thresholds keep their meaning.
+        """
+        if self.lexical is None:
+            raise RuntimeError("no lexical index attached to this store")
+        if self._size == 0 or len(self.items) == 0:
+            return [[] for _ in texts]
+        fetch = max(top_k, fetch_k or settings.HYBRID_FETCH_K)
+        rrf_k = settings.RRF_K if rrf_k is None else rrf_k
+        Q = normalize_rows(np.array(vecs, dtype=np.float32, ndmin=2))
+        out = []
+        with self._lock:
+            dense = self._search(Q, fetch)
+            dead = self._tombstones
+            for q, text, drows in zip(Q, texts, dense):
+                lrows = self.lexical.search(text, fetch, exclude=dead)
+                fused: Dict[int, float] = {}
+                for ranking in (drows, lrows):
+                    for rank, (r, _) in enumerate(ranking):
+                        fused[r] = fused.get(r, 0.0) + 1.0 / (rrf_k + rank + 1)
+                order = sorted(fused, key=lambda r: -fused[r])[:top_k]
+                cos = dict(drows)
+                extra = [r for r in order if r not in cos]
+                if extra:
+                    cos.update(zip(extra, (normalize_rows(self.vectors(extra)) @ q).tolist()))
+                out.append(self._hits([(r, float(cos[r])) for r in order], with_vectors))
+        return out
+
+    def _rerank(self, Q: np.ndarray, I: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-score candidate rows `I` against `Q` from the stored rows (at storage precision) and keep the best `k`."""
+        valid = I >= 0
+        rows = self._codec.decode(self._buf[np.where(valid, I, 0).ravel()]).reshape(I.shape[0], I.shape[1], -1)
+        rows /= np.maximum(np.linalg.norm(rows, axis=2, keepdims=True), 1e-12)
+        D = np.einsum("qkd,qd->qk", rows, Q)
+        D[~valid] = -np.inf
+        order = np.argsort(-D, axis=1)[:, :k]
+        return np.take_along_axis(D, order, axis=1).astype(np.float32), np.take_along_axis(I, order, axis=1)
+
+    # -- write-ahead log -------------------------------------------------
+
+    @staticmethod
+    def _wal_append(path: str, record: Dict[str, Any], embs: np.ndarray | None = None):
+        record = dict(record)
+        if embs is not None:
+            record["dim"] = int(embs.shape[1])
+            record["embeddings"] = base64.b64encode(np.ascontiguousarray(embs, dtype=np.float32).tobytes()).decode("ascii")
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with open(path + ".wal", "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def _wal_segments(path: str) -> List[str]:
+        """Closed segments (oldest first) followed by the active log."""
+        closed = sorted(glob.glob(glob.escape(path) + ".wal.*"), key=lambda p: int(p.rsplit(".", 1)[1]))
+        active = path + ".wal"
+        return closed + ([active] if os.path.exists(active) else [])
+
+    def _replay_wal(self, path: str):
+        applied = 0
+        for seg in self._wal_segments(path):
+            with open(seg, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        # torn tail write from a crash; everything before it is valid
+                        logger.warning("Ignoring truncated WAL record in %s", seg)
+                        break
+                    if rec.get("seq", 0) <= self._seq:
+                        continue
+                    if rec.get("op") == "add":
+                        raw = base64.b64decode(rec["embeddings"])
+                        embs = np.frombuffer(raw, dtype=np.float32).reshape(-1, rec["dim"])
+                        self._append_rows(embs)
+                        self.items.extend(rec["items"])
+                    elif rec.get("op") == "del":
+                        self._tombstones.update(rec["rows"])
+                    elif rec.get("op") == "vacuum" and self._tombstones:
+                        self._drop_tombstones()
+                    self._seq = rec["seq"]
+                    applied += 1
+        self._wal_pending = applied
+
+    def _maybe_compact(self):
+        with self._lock:
+            if self._compacting or self._wal_pending < self.compact_every:
+                return
+            self._compacting = True
+        t = threading.Thread(target=self._compact_background, name="vector-store-compact", daemon=True)
+        t.start()
+
+    def _compact_background(self):
         try:
-            meta_raw = data["meta"]
-            self.meta = json.loads(str(meta_raw.tolist()))
+            self.compact()
         except Exception:
-            self.meta = {}
+            logger.exception("Background compaction of %s failed", self.path)
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def compact(self):
+        """Fold the write-ahead log into a fresh snapshot at `path`."""
+        if not self.path:
+            return
+        path = self.path
+        with self._compact_lock:
+            self._compact_to(path)
+
+    def _compact_to(self, path: str):
+        with self._lock:
+            # freeze the current log as a closed segment and snapshot memory at the same seq
+            active = path + ".wal"
+            if os.path.exists(active):
+                os.replace(active, f"{active}.{self._seq}")
+            codes = None if self._buf is None else self._buf[: self._size].copy()
+            items = list(self.items)
+            deleted = sorted(self._tombstones)
+            seq = self._seq
+            self._wal_pending = 0
+            meta = dict(self.meta, index=self.index_info(), storage=self._codec.name)
+            index_bytes = self._index_bytes() if is_dir_format(path) else None
+        self._write_snapshot(path, codes, self._codec, items, meta, seq, deleted, index_bytes)
+        for seg in self._wal_segments(path):
+            if seg.endswith(".wal"):
+                continue
+            if int(seg.rsplit(".", 1)[1]) <= seq:
+                os.remove(seg)
+
+    # -- snapshot --------------------------------------------------------
+
+    @staticmethod
+    def _write_snapshot(path: str, codes, codec, items, meta, seq: int, deleted: List[int] | None = None, index_bytes: bytes | None = None, dtype: str | None = None):
+        if is_dir_format(path):
+            VectorStore._write_dir_snapshot(path, codes, codec, items, meta, seq, deleted, index_bytes, dtype)
+            return
+        # .npz snapshots always hold float32 rows
+        embeddings = None if codes is None else codec.decode(codes)
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        # include optional metadata
+        meta_str = json.dumps(meta) if meta is not None else json.dumps({})
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f,
+                embeddings=embeddings,
+                items=json.dumps(items),
+                meta=meta_str,
+                wal_seq=seq,
+                deleted=np.asarray(deleted or [], dtype=np.int64),
+            )
+        # atomic rename so readers never observe a half-written snapshot
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _write_dir_snapshot(path: str, codes, codec, items, meta, seq: int, deleted, index_bytes: bytes | None, dtype: str | None):
+        """Directory format: raw `.npy` matrix, JSON-lines items with an offset
+        table, optional serialized index, and `manifest.json` naming the files.
+
+        The matrix is written in the store's storage codec (or `dtype`, if given),
+        so a compressed store is mapped back without conversion.
+
+        Data files carry the WAL sequence in their names and the manifest is
+        replaced last, so a reader sees either the old or the new snapshot;
+        older snapshot files are removed afterwards (open mappings stay valid).
+        Other files are left alone, and a non-empty directory without a manifest
+        is refused rather than taken over.
+        """
+        os.makedirs(path, exist_ok=True)
+        manifest_path = os.path.join(path, MANIFEST)
+        previous: set = set()
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                previous = set(json.load(f).get("files", {}).values())
+        elif any(not name.startswith(MANIFEST) for name in os.listdir(path)):
+            raise FileExistsError(f"{path} is a non-empty directory without {MANIFEST}; refusing to write a snapshot into it")
+        out = make_codec(dtype) if dtype else codec
+        if codes is not None and out.name != codec.name:
+            codes = out.encode(codec.decode(codes))
+        files = {
+            "embeddings": f"embeddings.{seq}.npy",
+            "items": f"items.{seq}.jsonl",
+            "offsets": f"offsets.{seq}.npy",
+            "deleted": f"deleted.{seq}.npy",
+        }
+        if codes is not None:
+            np.save(os.path.join(path, files["embeddings"]), np.ascontiguousarray(codes))
+        else:
+            files.pop("embeddings")
+        offsets = np.zeros(len(items) + 1, dtype=np.int64)
+        with open(os.path.join(path, files["items"]), "wb") as f:
+            for i, item in enumerate(items):
+                line = json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n"
+                f.write(line)
+                offsets[i + 1] = offsets[i] + len(line)
+        np.save(os.path.join(path, files["offsets"]), offsets)
+        np.save(os.path.join(path, files["deleted"]), np.asarray(deleted or [], dtype=np.int64))
+        if index_bytes is not None:
+            files["index"] = f"index.{seq}.faiss"
+            with open(os.path.join(path, files["index"]), "wb") as f:
+                f.write(index_bytes)
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "count": len(items),
+            "dim": out.dim(int(codes.shape[1])) if codes is not None else None,
+            "dtype": out.name,
+            "wal_seq": seq,
+            "meta": meta or {},
+            "files": files,
+        }
+        tmp = os.path.join(path, MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, manifest_path)
+        keep = set(files.values())
+        for name in os.listdir(path):
+            if name in keep:
+                continue
+            # the lexical index is row-aligned with the replaced snapshot; precompute rewrites it
+            if name in previous or name == LEXICAL_FILE or SNAPSHOT_FILE_RE.match(name):
+                os.remove(os.path.join(path, name))
+
+    def _index_bytes(self) -> bytes | None:
+        # flat stores are searched from the matrix itself; only ANN structures are worth saving
+        if self._index is None or self._index.kind == "flat":
+            return None
+        return self._index.to_bytes()
+
+    def save(self, path: str, dtype: str | None = None):
+        """Write a snapshot to `path` (a `.npz` file or an index directory).
+
+        `dtype` (a storage codec name) overrides the matrix encoding of directory
+        snapshots; `.npz` snapshots always hold float32.
+        """
+        path = path.rstrip("/")
+        if path == self.path and dtype is None:
+            self.compact()
+            return
+        with self._lock:
+            codes = None if self._buf is None else self._buf[: self._size]
+            items = list(self.items)
+            deleted = sorted(self._tombstones)
+            seq = self._seq
+            meta = dict(self.meta, index=self.index_info(), storage=self._codec.name)
+            index_bytes = self._index_bytes() if is_dir_format(path) else None
+            self._write_snapshot(path, codes, self._codec, items, meta, seq, deleted, index_bytes, dtype)
+
+    def _load_dir(self, path: str):
+        with open(os.path.join(path, MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        files = manifest["files"]
+        self.meta = manifest.get("meta") or {}
+        self._seq = int(manifest.get("wal_seq", 0))
+        self._tombstones = set(np.load(os.path.join(path, files["deleted"])).tolist())
+        offsets = np.load(os.path.join(path, files["offsets"]), mmap_mode="r")
+        self.items = MappedItems(os.path.join(path, files["items"]), offsets)
+        self._index = None
+        self._exact_scan = False
+        if "embeddings" not in files:
+            self.embeddings = None
+            return
+        codes = np.load(os.path.join(path, files["embeddings"]), mmap_mode="r")
+        saved = make_codec(manifest.get("dtype"))
+        self._adopt_storage(saved.name)
+        if saved.name == self._codec.name:
+            # shared, read-only pages; appends copy into a private buffer on first growth
+            self._buf, self._size = codes, codes.shape[0]
+        else:
+            self.embeddings = saved.decode(codes)
+        index_type, params = self._index_config()
+        if index_type == "flat":
+            self._exact_scan = True
+            return
+        if "index" in files:
+            index = self._new_index(self.dim)
+            if index is not None and hasattr(index, "load_bytes"):
+                with open(os.path.join(path, files["index"]), "rb") as f:
+                    index.load_bytes(f.read())
+                index.set_search_params(**params)
+                self._index = index
+                return
         self._build_index()
+
+    def load(self, path: str):
+        path = path.rstrip("/")
+        with self._lock:
+            if is_dir_format(path):
+                if os.path.exists(os.path.join(path, MANIFEST)):
+                    self._load_dir(path)
+            elif os.path.exists(path):
+                data = np.load(path, allow_pickle=True)
+                # load optional metadata if present
+                try:
+                    meta_raw = data["meta"]
+                    self.meta = json.loads(str(meta_raw.tolist()))
+                except Exception:
+                    self.meta = {}
+                self._adopt_storage(self.meta.get("storage"))
+                embs = data["embeddings"]
+                # an empty store is saved with `embeddings=None` (object array)
+                self.embeddings = None if embs.dtype == object else embs
+                self.items = json.loads(str(data["items"].tolist()))
+                self._seq = int(data["wal_seq"]) if "wal_seq" in data.files else 0
+                self._tombstones = set(data["deleted"].tolist()) if "deleted" in data.files else set()
+                self._build_index()
+            self._replay_wal(path)
@@ -1,27 +1,299 @@
 """Utility to precompute embeddings for a support set JSONL file.
 
 Expect input JSONL where each line is: {"input":..., "reasoning":..., "correction":..., "error_type":...}
+
+The input is streamed in chunks of `--chunk-size` sentences. Each chunk is
+encoded (in `--workers` processes, `--batch-size` sentences per encode batch)
+and written as a shard to `<out>.shards/`; the shards are then assembled into
+the store snapshot. An interrupted build resumes from the completed shards when
+rerun with the same arguments on an unchanged input file.
+
+Every item carries a `hash` of its input text and the embedding model. With
+`--update <existing index>` the new JSONL is diffed against that index: only
+added or changed inputs are embedded, rows whose input is unchanged keep their
+vector, removed rows are tombstoned, and the result is written to `--out` as a
+new index version (the existing one is left untouched).
 """
+import hashlib
 import json
-from gec_service.vector_store import VectorStore
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from gec_service.vector_store import VectorStore, publish_version, resolve_version
+from gec_service.lexical import LexicalIndex, lexical_path, text_of
 from gec_service.config import settings
+from gec_service.logger import logger
+
 
+def content_hash(text: str, model: str | None = None) -> str:
+    """Identity of an embedding: the input text and the model that encodes it."""
+    model = model or settings.EMBEDDING_MODEL
+    return hashlib.sha1(f"{model}\0{text}".encode("utf-8")).hexdigest()
 
-def build_index(input_path: str, out_path: str):
-    texts = []
-    metas = []
+
+def read_items(input_path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
     with open(input_path, "r", encoding="utf-8") as f:
         for line in f:
+            if not line.strip():
+                continue
             obj = json.loads(line)
-            texts.append(obj.get("input", ""))
-            metas.append({"value": obj})
-    store = VectorStore(out_path)
+            text = obj.get("input", "")
+            yield text, {"value": obj, "hash": content_hash(text)}
+
+
+def chunked(items, chunk_size: int) -> Iterator[Tuple[List[str], List[Dict[str, Any]]]]:
+    texts, metas = [], []
+    for text, meta in items:
+        texts.append(text)
+        metas.append(meta)
+        if len(texts) >= chunk_size:
+            yield texts, metas
+            texts, metas = [], []
+    if texts:
+        yield texts, metas
+
+
+def read_chunks(input_path: str, chunk_size: int) -> Iterator[Tuple[List[str], List[Dict[str, Any]]]]:
+    """Yield `(texts, metas)` for consecutive runs of `chunk_size` non-empty lines."""
+    return chunked(read_items(input_path), chunk_size)
+
+
+def _encode(texts: List[str], batch_size: int) -> np.ndarray:
+    # runs in a worker process (or in-process with a single worker)
+    from gec_service.embeddings import embed_texts
+
+    return np.asarray(embed_texts(texts, batch_size=batch_size), dtype=np.float32)
+
+
+def _init_worker():
+    from gec_service.embeddings import get_model
+
+    get_model()
+
+
+def _shard_path(shard_dir: str, n: int) -> str:
+    return os.path.join(shard_dir, f"shard-{n:06d}.npz")
+
+
+def _write_shard(shard_dir: str, n: int, embs: np.ndarray, metas: List[Dict[str, Any]]):
+    # written under a temporary name and renamed, so a shard file is always complete
+    path = _shard_path(shard_dir, n)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, embeddings=embs, items=np.array(json.dumps(metas)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_shard(path: str) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    data = np.load(path, allow_pickle=False)
+    return data["embeddings"], json.loads(str(data["items"]))
+
+
+def _open_shard_dir(shard_dir: str, job: Dict[str, Any], resume: bool) -> set:
+    """Return the shard numbers already completed for `job` (empty on a fresh start)."""
+    job_path = os.path.join(shard_dir, "job.json")
+    if os.path.exists(job_path) and resume:
+        with open(job_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved != job:
+            raise ValueError(f"{shard_dir} was written by a different build ({saved}); rerun with --restart")
+        done = {int(name[6:12]) for name in os.listdir(shard_dir) if name.startswith("shard-") and name.endswith(".npz")}
+        if done:
+            logger.info("Resuming: %d shards already completed in %s", len(done), shard_dir)
+        return done
+    shutil.rmtree(shard_dir, ignore_errors=True)
+    os.makedirs(shard_dir)
+    with open(job_path, "w", encoding="utf-8") as f:
+        json.dump(job, f)
+    return set()
+
+
+def encode_shards(
+    input_path: str,
+    shard_dir: str,
+    chunk_size: int | None = None,
+    workers: int | None = None,
+    batch_size: int | None = None,
+    resume: bool = True,
+    items=None,
+    job: Dict[str, Any] | None = None,
+) -> int:
+    """Encode `input_path` (or the `(text, meta)` pairs in `items`) into shards under
+    `shard_dir`; return the shard count."""
+    chunk_size = chunk_size or settings.PRECOMPUTE_CHUNK_SIZE
+    workers = workers or settings.PRECOMPUTE_WORKERS
+    batch_size = batch_size or settings.PRECOMPUTE_BATCH_SIZE
+    # size and mtime identify the input's content, so an edited file is not resumed from stale shards
+    stat = os.stat(input_path)
+    job = dict(
+        job or {},
+        input=os.path.abspath(input_path),
+        input_size=stat.st_size,
+        input_mtime_ns=stat.st_mtime_ns,
+        chunk_size=chunk_size,
+        embedding_model=settings.EMBEDDING_MODEL,
+    )
+    done = _open_shard_dir(shard_dir, job, resume)
+
+    start = time.perf_counter()
+    encoded = 0
+    total = 0
+
+    def report(n: int, rows: int):
+        nonlocal encoded
+        encoded += rows
+        elapsed = time.perf_counter() - start
+        logger.info("shard %d: %d sentences encoded this run, %.1f sentences/s", n, encoded, encoded / elapsed if elapsed else 0.0)
+
+    chunks = enumerate(chunked(items, chunk_size) if items is not None else read_chunks(input_path, chunk_size))
+    if workers <= 1:
+        for n, (texts, metas) in chunks:
+            total = n + 1
+            if n in done:
+                continue
+            _write_shard(shard_dir, n, _encode(texts, batch_size), metas)
+            report(n, len(texts))
+    else:
+        # bounded window of chunks in flight so memory stays flat on large inputs
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending = {}
+            for n, (texts, metas) in chunks:
+                total = n + 1
+                if n in done:
+                    continue
+                pending[pool.submit(_encode, texts, batch_size)] = (n, metas)
+                if len(pending) >= 2 * workers:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        sn, smetas = pending.pop(fut)
+                        _write_shard(shard_dir, sn, fut.result(), smetas)
+                        report(sn, len(smetas))
+            for fut in list(pending):
+                sn, smetas = pending.pop(fut)
+                _write_shard(shard_dir, sn, fut.result(), smetas)
+                report(sn, len(smetas))
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        "Encoded %d sentences in %.1fs (%.1f sentences/s, %d workers, %d/%d shards resumed)",
+        encoded, elapsed, encoded / elapsed if elapsed else 0.0, workers, len(done), total,
+    )
+    return total
+
+
+def build_index(
+    input_path: str,
+    out_path: str,
+    index_type: str | None = None,
+    storage: str | None = None,
+    chunk_size: int | None = None,
+    workers: int | None = None,
+    batch_size: int | None = None,
+    resume: bool = True,
+    keep_shards: bool = False,
+):
+    shard_dir = out_path.rstrip("/") + ".shards"
+    shards = encode_shards(input_path, shard_dir, chunk_size, workers, batch_size, resume)
+    # build in memory and write a single snapshot (no write-ahead log for bulk builds)
+    store = VectorStore(index_type=index_type or settings.SUPPORT_INDEX_TYPE, storage=storage or settings.SUPPORT_STORAGE)
     # record which embedding model was used to create this index
     try:
         store.meta["embedding_model"] = settings.EMBEDDING_MODEL
     except Exception:
         store.meta = {"embedding_model": getattr(settings, "EMBEDDING_MODEL", None)}
-    store.add(texts, metas)
+    start = time.perf_counter()
+    _add_shards(store, shard_dir, shards)
+    store.save(out_path)
+    write_lexical(store, out_path)
+    logger.info("Indexed %d items into %s in %.1fs", len(store.items), out_path, time.perf_counter() - start)
+    if not keep_shards:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    return store
+
+
+def write_lexical(store: VectorStore, out_path: str):
+    """BM25 index over the item inputs, row-aligned with the snapshot (see `gec_service.lexical`)."""
+    start = time.perf_counter()
+    LexicalIndex.build(text_of(it) for it in store.items).save(lexical_path(out_path))
+    logger.info("Wrote lexical index %s in %.1fs", lexical_path(out_path), time.perf_counter() - start)
+
+
+def _add_shards(store: VectorStore, shard_dir: str, shards: int):
+    for n in range(shards):
+        embs, metas = _read_shard(_shard_path(shard_dir, n))
+        store.add_vectors(embs, metas)
+
+
+def update_index(
+    input_path: str,
+    base_path: str,
+    out_path: str,
+    chunk_size: int | None = None,
+    workers: int | None = None,
+    batch_size: int | None = None,
+    resume: bool = True,
+    keep_shards: bool = False,
+):
+    """Write `input_path` as a new version of the index at `base_path`, embedding only
+    inputs whose content hash is not already in the base."""
+    store = VectorStore()
+    store.load(resolve_version(base_path))
+    # indexes built before hashes were stored are hashed with the model they record
+    base_model = store.meta.get("embedding_model")
+    live: Dict[str, List[int]] = {}
+    for row, item in enumerate(store.items):
+        if store.is_deleted(row):
+            continue
+        h = item.get("hash")
+        if h is None and base_model:
+            h = content_hash((item.get("value") or {}).get("input", ""), base_model)
+        live.setdefault(h, []).append(row)
+
+    kept: set = set()
+    moved_rows, moved_metas = [], []
+    added = []
+    for text, meta in read_items(input_path):
+        rows = live.get(meta["hash"])
+        if not rows:
+            added.append((text, meta))
+            continue
+        row = rows.pop()
+        if store.items[row].get("value") == meta["value"] and store.items[row].get("hash") == meta["hash"]:
+            kept.add(row)
+        else:
+            # same input, new correction/metadata: re-add with the existing vector
+            moved_rows.append(row)
+            moved_metas.append(meta)
+    removed = [row for rows in live.values() for row in rows]
+    logger.info(
+        "Update %s -> %s: %d unchanged, %d updated, %d added, %d removed",
+        base_path, out_path, len(kept), len(moved_rows), len(added), len(removed),
+    )
+
+    shard_dir = out_path.rstrip("/") + ".shards"
+    job = {"update": os.path.abspath(base_path)}
+    shards = encode_shards(input_path, shard_dir, chunk_size, workers, batch_size, resume, items=added, job=job)
+    start = time.perf_counter()
+    if moved_rows:
+        store.add_vectors(store.vectors(moved_rows), moved_metas)
+    store.delete(removed + moved_rows)
+    _add_shards(store, shard_dir, shards)
+    if store.needs_vacuum():
+        store.vacuum()
+    store.meta["embedding_model"] = settings.EMBEDDING_MODEL
+    store.save(out_path)
+    write_lexical(store, out_path)
+    logger.info("Wrote %d live items to %s in %.1fs", store.count(), out_path, time.perf_counter() - start)
+    if not keep_shards:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    return store
 
 
 if __name__ == "__main__":
@@ -30,5 +302,39 @@ if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("--in", dest="infile", required=True)
     p.add_argument("--out", dest="outfile", required=True)
+    p.add_argument("--index-type", dest="index_type", default=None, help="flat | hnsw | ivf_flat | ivf_pq | pq | annoy")
+    p.add_argument("--storage", default=None, help="float32 | float16 | int8")
+    p.add_argument("--chunk-size", dest="chunk_size", type=int, default=None, help="sentences per shard")
+    p.add_argument("--workers", type=int, default=None, help="encoder processes (each loads the model)")
+    p.add_argument("--batch-size", dest="batch_size", type=int, default=None, help="sentences per encode batch")
+    p.add_argument("--update", dest="base", default=None, help="existing index to diff against; only new or changed inputs are embedded")
+    p.add_argument("--restart", action="store_true", help="discard shards from an earlier run")
+    p.add_argument("--keep-shards", dest="keep_shards", action="store_true")
+    p.add_argument("--publish", action="store_true", help="point <out>/../CURRENT at the new version (versioned index roots)")
     args = p.parse_args()
-    build_index(args.infile, args.outfile)
+    if args.base:
+        update_index(
+            args.infile,
+            args.base,
+            args.outfile,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            resume=not args.restart,
+            keep_shards=args.keep_shards,
+        )
+    else:
+        build_index(
+            args.infile,
+            args.outfile,
+            index_type=args.index_type,
+            storage=args.storage,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            resume=not args.restart,
+            keep_shards=args.keep_shards,
+        )
+    if args.publish:
+        root, version = os.path.split(args.outfile.rstrip("/"))
+        publish_version(root or ".", version)
@@ -21,6 +21,13 @@ def inspect_index(path: str) -> dict:
     p = Path(path)
     if not p.exists():
         return {"exists": False}
+    if p.is_dir():
+        # directory snapshot: everything needed is in the manifest
+        try:
+            manifest = json.loads((p / "manifest.json").read_text(encoding="utf-8"))
+        except Exception as e:
+            return {"exists": True, "error": str(e)}
+        return {"exists": True, "n_items": manifest.get("count"), "meta": manifest.get("meta", {}), "emb_dim": manifest.get("dim")}
     try:
         data = np.load(str(p), allow_pickle=True)
     except Exception as e:
@@ -48,8 +55,8 @@ def inspect_index(path: str) -> dict:
 
 def main():
     print("Embedding model (env/default):", CONFIG_EMBEDDING_MODEL)
-    support_path = "./data/support_index.npz"
-    cache_path = "./data/cache_index.npz"
+    support_path = os.environ.get("SUPPORT_INDEX_PATH", "./data/support_index.npz")
+    cache_path = os.environ.get("CACHE_INDEX_PATH", "./data/cache_index.npz")
 
     print("Inspecting support index:")
     s_info = inspect_index(support_path)
@@ -0,0 +1,39 @@
+"""Convert a `.npz` store snapshot to the memory-mapped directory format (or back).
+
+Usage:
+python scripts/convert_index.py --src data/support_index.npz --dst data/support_index
+python scripts/convert_index.py --src data/support_index.npz --dst data/support_index --dtype float16
+
+Pending write-ahead log records of the source are folded into the output.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+repo_root = str(Path(__file__).resolve().parents[1])
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+from gec_service.vector_store import VectorStore
+
+
+def convert(src: str, dst: str, dtype: str | None = None):
+    store = VectorStore()
+    start = time.perf_counter()
+    store.load(src)
+    loaded = time.perf_counter() - start
+    store.save(dst, dtype=dtype)
+    print(f"Converted {len(store.items)} items {src} -> {dst} (source load {loaded:.2f}s)")
+    start = time.perf_counter()
+    VectorStore().load(dst)
+    print(f"Output loads in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--src", required=True)
+    p.add_argument("--dst", required=True)
+    p.add_argument("--dtype", default=None, help="float32 | float16 | int8 (directory output only)")
+    args = p.parse_args()
+    convert(args.src, args.dst, dtype=args.dtype)
@@ -0,0 +1,98 @@
+"""Compare embedding storage / index combinations against exact float32 search.
+
+For each combination it reports recall@k of the true top-k, the mean absolute
+error of the top-1 score, how often a cache-style threshold decision
+(`top-1 >= --threshold`) agrees with exact search, and bytes per row — with
+and without re-ranking.
+
+Usage:
+python scripts/quantization_report.py --index data/support_index
+python scripts/quantization_report.py --random 20000 --dim 384
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+repo_root = str(Path(__file__).resolve().parents[1])
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+from gec_service.vector_store import VectorStore, normalize_rows
+
+
+def load_rows(args) -> np.ndarray:
+    if args.index:
+        store = VectorStore()
+        store.load(args.index)
+        embs = store.embeddings
+        if embs is None:
+            raise SystemExit(f"{args.index} holds no embeddings")
+        return normalize_rows(np.array(embs, dtype=np.float32))
+    rng = np.random.default_rng(args.seed)
+    # clustered data, closer to sentence embeddings than uniform noise
+    centers = rng.standard_normal((max(args.random // 50, 1), args.dim)).astype(np.float32)
+    rows = centers[rng.integers(0, len(centers), args.random)] + 0.5 * rng.standard_normal((args.random, args.dim)).astype(np.float32)
+    return normalize_rows(rows)
+
+
+def make_queries(rows: np.ndarray, n: int, seed: int) -> np.ndarray:
+    # perturbed copies of stored rows: the near-duplicate regime the cache threshold targets
+    rng = np.random.default_rng(seed + 1)
+    picks = rows[rng.integers(0, len(rows), n)]
+    # noise of norm ~0.3 puts cosines around 0.95, right at the default threshold
+    noise = rng.standard_normal(picks.shape).astype(np.float32) * (0.3 / np.sqrt(rows.shape[1]))
+    return normalize_rows(picks + noise)
+
+
+def search(store: VectorStore, Q: np.ndarray, k: int):
+    results = store.query_batch(Q, top_k=k)
+    ids = [[it["id"] for it, _ in r] for r in results]
+    top1 = np.array([r[0][1] if r else -1.0 for r in results], dtype=np.float32)
+    return ids, top1
+
+
+def run(args):
+    rows = load_rows(args)
+    Q = make_queries(rows, args.queries, args.seed)
+    metas = [{"id": i} for i in range(len(rows))]
+    print(f"{len(rows)} rows, dim {rows.shape[1]}, {len(Q)} queries, k={args.k}, threshold={args.threshold}")
+
+    exact = VectorStore(index_type="flat", storage="float32", rerank_k=0)
+    exact.add_vectors(rows, metas)
+    true_ids, true_top1 = search(exact, Q, args.k)
+    true_hit = true_top1 >= args.threshold
+
+    header = f"{'storage':8} {'index':9} {'rerank':>6} {'recall':>7} {'top1 err':>9} {'agree':>7} {'B/row':>6} {'memory MB':>10} {'ms/query':>9}"
+    print(header)
+    print("-" * len(header))
+    for storage in args.storage.split(","):
+        for index_type in args.index_types.split(","):
+            for rerank_k in sorted({0, args.rerank_k}):
+                store = VectorStore(index_type=index_type, storage=storage, rerank_k=rerank_k)
+                store.add_vectors(rows, metas)
+                start = time.perf_counter()
+                ids, top1 = search(store, Q, args.k)
+                ms = 1000 * (time.perf_counter() - start) / len(Q)
+                recall = np.mean([len(set(a) & set(b)) / max(len(b), 1) for a, b in zip(ids, true_ids)])
+                err = float(np.mean(np.abs(top1 - true_top1)))
+                agree = float(np.mean((top1 >= args.threshold) == true_hit))
+                mem = store.memory_bytes()["total"] / 2**20
+                print(f"{storage:8} {index_type:9} {rerank_k:>6} {recall:>7.4f} {err:>9.2e} {agree:>7.4f} {store.bytes_per_row():>6} {mem:>10.1f} {ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--index", default=None, help="store snapshot to read rows from (.npz or directory)")
+    p.add_argument("--random", type=int, default=20000, help="number of synthetic rows when --index is not given")
+    p.add_argument("--dim", type=int, default=384)
+    p.add_argument("--queries", type=int, default=500)
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument("--threshold", type=float, default=0.95)
+    p.add_argument("--storage", default="float32,float16,int8")
+    p.add_argument("--index-types", dest="index_types", default="flat,hnsw,pq")
+    p.add_argument("--rerank-k", dest="rerank_k", type=int, default=32)
+    p.add_argument("--seed", type=int, default=0)
+    run(p.parse_args())
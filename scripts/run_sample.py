@@ -28,11 +28,33 @@ except ModuleNotFoundError:
             def deco(f):
                 return f
             return deco
+        def on_event(self, *a, **kw):
+            def deco(f):
+                return f
+            return deco
+        def middleware(self, *a, **kw):
+            def deco(f):
+                return f
+            return deco
     class HTTPException(Exception):
         pass
+    class Request:
+        pass
+    def Header(default=None, **kw):
+        return default
     fm.FastAPI = FastAPI
     fm.HTTPException = HTTPException
+    fm.Request = Request
+    fm.Header = Header
+    fr = types.ModuleType("fastapi.responses")
+    class _Response:
+        def __init__(self, *a, **kw):
+            pass
+    fr.JSONResponse = _Response
+    fr.StreamingResponse = _Response
+    fm.responses = fr
     sys.modules["fastapi"] = fm
+    sys.modules["fastapi.responses"] = fr
 try:
     import pydantic  # type: ignore
 except ModuleNotFoundError:
@@ -86,14 +108,25 @@ try:
 except ModuleNotFoundError:
     import types
     om = types.ModuleType("openai")
-    class ChatCompletion:
-        @staticmethod
-        def create(*args, **kwargs):
-            return {"choices": [{"message": {"content": "{}"}}]}
-        @staticmethod
-        async def acreate(*args, **kwargs):
-            return {"choices": [{"message": {"content": "{}"}}]}
-    om.ChatCompletion = ChatCompletion
+    class _Completion:
+        def __init__(self):
+            self.choices = [types.SimpleNamespace(message=types.SimpleNamespace(content="{}"))]
+        def model_dump(self):
+            return {"choices": [{"message": {"content": "{}"}}], "usage": None}
+    class OpenAI:
+        def __init__(self, *args, **kwargs):
+            self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=lambda *a, **kw: _Completion()))
+        def close(self):
+            pass
+    class AsyncOpenAI:
+        def __init__(self, *args, **kwargs):
+            async def create(*a, **kw):
+                return _Completion()
+            self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=create))
+        async def close(self):
+            pass
+    om.OpenAI = OpenAI
+    om.AsyncOpenAI = AsyncOpenAI
     sys.modules['openai'] = om
 
 import gec_service.api as api_module
@@ -102,7 +135,7 @@ import asyncio
 import json
 
 
-async def _mock_llm(prompt: str, max_tokens: int = 256):
+async def _mock_llm(prompt: str, max_tokens: int = 256, **kwargs):
     # This mock returns a valid CorrectionResponse-like dict
     return {
         "input": "She go to school yesterday.",
@@ -115,6 +148,8 @@ async def _mock_llm(prompt: str, max_tokens: int = 256):
 def main():
     # patch the api module's async LLM to our mock
     api_module.call_llm_async = _mock_llm
+    # the app loads indexes in a startup task; load them directly here
+    api_module.load_state()
 
     payload = {"input": "She go to school yesterday."}
     print("CALL api.correct with ->", payload)
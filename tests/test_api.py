@@ -0,0 +1,171 @@
+import asyncio
+import json
+import pathlib
+import threading
+import time
+import zlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+from fastapi.testclient import TestClient
+
+import precompute
+from gec_service import api, embeddings
+from gec_service.cache import SemanticCache
+from gec_service.config import settings
+from gec_service.models import CorrectionResponse
+from gec_service.singleflight import SingleFlight
+from gec_service.vector_store import publish_version
+
+
+class FakeModel:
+    # deterministic per-text unit vectors instead of a sentence-transformers model
+    def encode(self, texts, batch_size=None, convert_to_numpy=True, normalize_embeddings=True):
+        vecs = np.stack([np.random.default_rng(zlib.crc32(t.encode())).standard_normal(16) for t in texts])
+        return (vecs / np.linalg.norm(vecs, axis=1, keepdims=True)).astype(np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 16
+
+
+def _build(root, version, word):
+    src = str(root.parent / f"{version}.jsonl")
+    with open(src, "w", encoding="utf-8") as f:
+        for i in range(20):
+            f.write(json.dumps({"input": f"He go to the {word} {i}.", "correction": f"He goes to the {word} {i}."}) + "\n")
+    precompute.build_index(src, str(root / version), workers=1)
+
+
+@pytest.fixture
+def llm_calls(tmp_path, monkeypatch):
+    """A fresh service over a `v1` support index, with the LLM stubbed out.
+
+    Returns the list of inputs (prompts, for streams) the stubbed LLM was called with.
+    """
+    monkeypatch.setattr(embeddings, "_model", FakeModel())
+    root = tmp_path / "support"
+    _build(root, "v1", "school")
+    publish_version(str(root), "v1")
+
+    monkeypatch.setattr(api, "SUPPORT_INDEX_PATH", str(root))
+    monkeypatch.setattr(api, "CACHE_INDEX_PATH", str(tmp_path / "cache"))
+    monkeypatch.setattr(api, "cache", SemanticCache(path=str(tmp_path / "cache"), backend="local"))
+    monkeypatch.setattr(api, "readiness", {name: False for name in api.readiness})
+    monkeypatch.setattr(api, "startup_error", None)
+    monkeypatch.setattr(api, "support_version", {"version": None, "path": None, "count": 0, "loaded_at": None})
+    monkeypatch.setattr(api, "inflight", SingleFlight())
+    monkeypatch.setattr(api, "_reload_lock", asyncio.Lock())
+    monkeypatch.setattr(settings, "INDEX_WATCH_INTERVAL", 0.0)
+
+    calls = []
+
+    async def call_llm_async(prompt, max_tokens=None, input_text=None, **kwargs):
+        calls.append(input_text)
+        await asyncio.sleep(0.2)
+        if "fail" in input_text:
+            raise RuntimeError("LLM down")
+        return {"reasoning": "r", "correction": input_text.replace(" go ", " goes "), "error_type": "SVA"}
+
+    async def stream_llm_async(prompt, max_tokens=None):
+        calls.append(prompt)
+        answer = json.dumps({"correction": "She goes home.", "error_type": "SVA", "reasoning": "agreement"})
+        for i in range(0, len(answer), 7):
+            yield answer[i : i + 7]
+
+    monkeypatch.setattr(api, "call_llm_async", call_llm_async)
+    monkeypatch.setattr(api, "stream_llm_async", stream_llm_async)
+    monkeypatch.setattr(api, "call_llm", lambda prompt, max_tokens=None: {})
+    return calls
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def _started(client):
+    _wait_until(lambda: client.get("/readyz").status_code == 200)
+    return client
+
+
+def test_readyz_is_503_until_everything_is_loaded(llm_calls):
+    client = TestClient(api.app)
+    # without the startup event nothing is loaded yet
+    r = client.get("/readyz")
+    assert r.status_code == 503 and r.json()["components"] == {"support_index": False, "cache_index": False, "model": False}
+    assert client.post("/correct", json={"input": "He go."}).status_code == 503
+    with TestClient(api.app) as client:
+        body = _started(client).get("/readyz").json()
+        assert body["ready"] and all(body["components"].values())
+
+
+def test_batch_reports_a_status_per_item(llm_calls):
+    with TestClient(api.app) as client:
+        _started(client)
+        api.cache.upsert("They go now.", CorrectionResponse(input="They go now.", reasoning="", correction="They goes now."))
+        items = [{"input": t} for t in ("They go now.", "She go home.", "It fail here.", "She go home.")]
+        r = client.post("/correct/batch", json={"items": items})
+    results = r.json()["results"]
+    assert [res["index"] for res in results] == [0, 1, 2, 3]
+    assert [res["status"] for res in results] == ["cached", "ok", "error", "ok"]
+    assert results[1]["result"]["correction"] == "She goes home."
+    assert "LLM failed" in results[2]["error"]
+    # the duplicate input shares the first one's LLM call
+    assert sorted(llm_calls) == ["It fail here.", "She go home."]
+
+
+def test_concurrent_duplicates_make_one_llm_call(llm_calls):
+    with TestClient(api.app) as client:
+        _started(client)
+        out = []
+
+        def post():
+            out.append(client.post("/correct", json={"input": "We go out."}).json()["correction"])
+
+        threads = [threading.Thread(target=post) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        metrics = client.get("/metrics").json()["singleflight"]
+    assert out == ["We goes out."] * 5
+    assert llm_calls == ["We go out."]
+    assert metrics["leaders"] == 1 and metrics["followers"] == 4
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "sse"])
+def test_stream_frames_fields_then_done(llm_calls, fmt):
+    with TestClient(api.app) as client:
+        _started(client)
+        r = client.post(f"/correct/stream?format={fmt}", json={"input": "She go home."})
+    assert r.headers["content-type"].startswith({"ndjson": "application/x-ndjson", "sse": "text/event-stream"}[fmt])
+    if fmt == "ndjson":
+        assert r.text.endswith("\n")
+        events = [(e["event"], e["data"]) for e in map(json.loads, r.text.splitlines())]
+    else:
+        assert r.text.endswith("\n\n")
+        events = []
+        for frame in r.text.split("\n\n")[:-1]:
+            event, data = frame.split("\n")
+            assert event.startswith("event: ") and data.startswith("data: ")
+            events.append((event[7:], json.loads(data[6:])))
+    assert [name for name, _ in events] == ["correction", "error_type", "reasoning", "done"]
+    assert events[0][1] == {"correction": "She goes home."}
+    assert events[-1][1]["reasoning"] == "agreement"
+
+
+def test_watcher_swaps_the_index_when_current_changes(llm_calls, monkeypatch):
+    monkeypatch.setattr(settings, "INDEX_WATCH_INTERVAL", 0.05)
+    root = pathlib.Path(api.SUPPORT_INDEX_PATH)
+    with TestClient(api.app) as client:
+        _started(client)
+        assert client.get("/metrics").json()["support_index"]["version"] == "v1"
+        _build(root, "v2", "market")
+        publish_version(str(root), "v2")
+        _wait_until(lambda: client.get("/metrics").json()["support_index"]["version"] == "v2")
+        hits = api.support_store.query_batch(embeddings.embed_texts(["He go to the market 3."]), top_k=1)[0]
+    assert hits[0][0]["value"]["input"] == "He go to the market 3."
@@ -0,0 +1,78 @@
+import time
+import zlib
+
+import numpy as np
+
+
+def _cache(**kw):
+    from gec_service.cache import SemanticCache
+
+    return SemanticCache(backend="local", **kw)
+
+
+def _put(cache, text, ttl=None):
+    from gec_service.models import CorrectionResponse
+
+    vec = np.random.default_rng(zlib.crc32(text.encode())).standard_normal(16).astype(np.float32)
+    cache.upsert(text, CorrectionResponse(input=text, reasoning="", correction=text.upper()), vec=vec, ttl=ttl)
+
+
+def _live(cache):
+    return sorted(cache.store.items[e["row"]]["value"]["input"] for e in cache._entries.values())
+
+
+def test_lru_evicts_least_recently_used():
+    cache = _cache(max_entries=2, policy="lru")
+    _put(cache, "aa")
+    _put(cache, "bb")
+    assert cache.lookup_exact("aa") is not None
+    _put(cache, "cc")
+    assert _live(cache) == ["aa", "cc"] and cache.evictions == 1
+
+
+def test_lfu_evicts_least_frequently_used():
+    cache = _cache(max_entries=2, policy="lfu")
+    _put(cache, "aa")
+    _put(cache, "bb")
+    for text in ("aa", "aa", "bb"):
+        cache.lookup_exact(text)
+    # bb is the most recent but the least used
+    _put(cache, "cc")
+    assert _live(cache) == ["aa", "cc"]
+
+
+def test_tinylfu_rejects_one_off_keys_when_full():
+    cache = _cache(max_entries=1, policy="tinylfu")
+    _put(cache, "hot")
+    for _ in range(3):
+        cache.lookup_exact("hot")
+    _put(cache, "cold")
+    assert _live(cache) == ["hot"] and cache.rejected == 1
+    for _ in range(5):
+        cache.lookup_exact("warm")
+    _put(cache, "warm")
+    assert _live(cache) == ["warm"] and cache.evictions == 1
+
+
+def test_byte_cap_evicts_and_rejects_oversized_entries():
+    cache = _cache(policy="lru")
+    _put(cache, "aa")
+    size = cache._bytes
+    cache.max_bytes = int(2.5 * size)
+    _put(cache, "bb")
+    _put(cache, "cc")
+    assert _live(cache) == ["bb", "cc"] and cache._bytes <= cache.max_bytes
+    _put(cache, "x" * (3 * size))
+    assert cache.rejected == 1 and _live(cache) == ["bb", "cc"]
+
+
+def test_ttl_expires_on_lookup_and_drops_the_row_on_next_write():
+    cache = _cache(ttl=0.05)
+    _put(cache, "aa")
+    _put(cache, "bb", ttl=0)
+    time.sleep(0.1)
+    assert cache.lookup_exact("aa") is None and cache.expirations == 1
+    assert cache.lookup_exact("bb").correction == "BB"
+    _put(cache, "cc", ttl=0)
+    stored = [it["value"]["input"] for r, it in enumerate(cache.store.items) if not cache.store.is_deleted(r)]
+    assert sorted(stored) == _live(cache) == ["bb", "cc"]
@@ -0,0 +1,72 @@
+import numpy as np
+
+
+def _cache(db, **kw):
+    from gec_service.cache import SemanticCache
+
+    cache = SemanticCache(backend="sqlite", db_path=db, **kw)
+    cache.load(None)
+    return cache
+
+
+def _put(cache, text, seed):
+    from gec_service.models import CorrectionResponse
+
+    vec = np.random.default_rng(seed).standard_normal(16).astype(np.float32)
+    cache.upsert(text, CorrectionResponse(input=text, reasoning="", correction=text + "."), vec=vec / np.linalg.norm(vec))
+
+
+def test_sqlite_backend_shares_entries_and_evictions(tmp_path):
+    db = str(tmp_path / "cache.sqlite3")
+    a, b = _cache(db, max_entries=2), _cache(db)
+    for i in range(3):
+        _put(a, f"sentence {i}", i)
+    assert b.sync() == 4  # three puts and one eviction
+    assert b.lookup_exact("sentence 0") is None
+    assert b.lookup_exact("sentence 2").correction == "sentence 2."
+    _put(b, "from b", 9)
+    a.sync()
+    assert a.lookup_exact("from b") is not None
+    # a new worker rebuilds the same live set from the log
+    assert sorted(e["key"] for e in _cache(db)._entries.values()) == sorted(e["key"] for e in b._entries.values())
+
+
+def test_sqlite_backend_expiry_survives_vacuum_on_sync(tmp_path):
+    import time
+    from gec_service.models import CorrectionResponse
+
+    db = str(tmp_path / "cache.sqlite3")
+    a = _cache(db)
+    rng = np.random.default_rng(0)
+    for i in range(10):
+        vec = rng.standard_normal(16).astype(np.float32)
+        a.upsert(f"e{i}", CorrectionResponse(input=f"e{i}", reasoning="", correction=f"E{i}"), vec=vec, ttl=0.05 if i >= 8 else 0)
+    b = _cache(db, max_entries=10)
+    for i in range(3):
+        _put(b, f"n{i}", i)  # evicts e0-e2
+    time.sleep(0.1)
+    assert a.lookup_exact("e8") is None  # expired; its row is dropped on the next write
+    a.sync()  # applying b's puts and deletes vacuums and renumbers a's rows
+    _put(a, "fresh", 42)
+    for entry_id, entry in a._entries.items():
+        assert not a.store.is_deleted(entry["row"]), entry["key"]
+        assert a.store.items[entry["row"]]["id"] == entry_id
+    assert [a.lookup_exact(t).correction for t in ("n1", "e7", "fresh")] == ["n1.", "E7", "fresh."]
+
+
+def test_sync_evicts_remote_puts_beyond_the_replica_caps(tmp_path):
+    db = str(tmp_path / "cache.sqlite3")
+    a, b = _cache(db, max_entries=0), _cache(db, max_entries=3)
+    for i in range(8):
+        _put(a, f"sentence {i}", i)
+    assert b.sync() == 8
+    assert len(b._entries) == 3 and b.metrics()["evictions"] == 5
+    live = [row for row in range(len(b.store.items)) if not b.store.is_deleted(row)]
+    assert sorted(b._entries[e]["row"] for e in b._entries) == live
+    assert b.lookup_exact("sentence 7").correction == "sentence 7."
+    # evictions are local to the replica; the writer keeps all its entries
+    a.sync()
+    assert len(a._entries) == 8
+
+    c = _cache(db, max_entries=0, max_bytes=3 * b._entries[next(iter(b._entries))]["nbytes"])
+    assert len(c._entries) == 3 and c._bytes <= c.max_bytes
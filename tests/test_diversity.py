@@ -0,0 +1,32 @@
+import numpy as np
+
+from gec_service.diversity import mmr
+from gec_service.prompt_builder import build_prompt, select_shots
+
+
+def _candidates():
+    base = np.eye(16, dtype=np.float32)[:3]
+    # rows 0-2 are near-copies of one sentence, rows 3 and 4 are distinct
+    embs = np.stack([base[0], base[0] + 0.01, base[0] + 0.02, base[1], base[2]])
+    scores = [0.9, 0.89, 0.88, 0.7, 0.6]
+    return scores, embs
+
+
+def test_mmr_skips_near_duplicates():
+    scores, embs = _candidates()
+    assert mmr(scores, embs, 3, lam=0.7) == [0, 3, 4]
+    # lambda=1 is plain relevance order, minus rows within the duplicate threshold
+    assert mmr(scores, embs, 5, lam=1.0, duplicate_threshold=0.95) == [0, 3, 4]
+    assert mmr(scores, embs, 5, lam=1.0, duplicate_threshold=1.01) == [0, 1, 2, 3, 4]
+    assert mmr([], np.zeros((0, 16)), 3) == []
+
+
+def test_prompt_uses_mmr_when_candidates_carry_embeddings():
+    scores, embs = _candidates()
+    retrieved = [{"value": {"input": f"sentence {i}"}, "score": s, "embedding": e} for i, (s, e) in enumerate(zip(scores, embs))]
+    assert [r["value"]["input"] for r in select_shots(retrieved, 3)] == ["sentence 0", "sentence 3", "sentence 4"]
+    prompt = build_prompt("Test.", retrieved, top_k=3)
+    assert "sentence 3" in prompt and "sentence 1" not in prompt
+    # without embeddings the stride selection is unchanged
+    plain = [{"value": {"input": f"sentence {i}"}} for i in range(6)]
+    assert [r["value"]["input"] for r in select_shots(plain, 3)] == ["sentence 0", "sentence 2", "sentence 4"]
@@ -0,0 +1,19 @@
+import pytest
+
+from gec_service.edits import EditError, apply_edits, validate_edits
+
+
+def test_apply_replace_insert_delete():
+    text = "He go to school yesterday"
+    edits = validate_edits(text, [[1, 2, "went", "VT"], [3, 3, "the", "DET"], [5, 5, "."]])
+    assert apply_edits(text, edits) == "He went to the school yesterday."
+    assert apply_edits(text, validate_edits(text, [[2, 3, ""]])) == "He go school yesterday"
+    assert validate_edits(text, []) == []
+
+
+def test_invalid_edits_rejected():
+    text = "He go to school"
+    with pytest.raises(EditError):
+        validate_edits(text, [[0, 9, "x"]])
+    with pytest.raises(EditError):
+        validate_edits(text, [[1, 3, "a"], [2, 4, "b"]])
@@ -0,0 +1,55 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from gec_service import embeddings
+from gec_service.embeddings import BatchingEmbedder
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    seen = []
+
+    def encode(texts, batch_size=None):
+        seen.append(list(texts))
+        if "boom" in texts:
+            raise RuntimeError("encode failed")
+        return np.array([[float(len(t))] for t in texts], dtype=np.float32)
+
+    monkeypatch.setattr(embeddings, "embed_texts", encode)
+    return seen
+
+
+def test_concurrent_texts_share_one_encode(calls):
+    batcher = BatchingEmbedder(window_ms=20, max_batch=8)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed("x" * n) for n in range(1, 6)))
+
+    out = asyncio.run(run())
+    assert [float(v[0]) for v in out] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert calls == [["x", "xx", "xxx", "xxxx", "xxxxx"]]
+    assert batcher.metrics()["batches"] == 1 and not batcher._tasks
+
+
+def test_max_batch_splits_the_queue(calls):
+    batcher = BatchingEmbedder(window_ms=20, max_batch=3)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed(str(n)) for n in range(7)))
+
+    assert len(asyncio.run(run())) == 7
+    assert [len(batch) for batch in calls] == [3, 3, 1]
+    assert batcher.metrics()["max_batch_size"] == 3
+
+
+def test_encode_error_reaches_every_waiter_of_the_batch(calls):
+    batcher = BatchingEmbedder(window_ms=20, max_batch=8)
+
+    async def run():
+        return await asyncio.gather(batcher.embed("a"), batcher.embed("boom"), return_exceptions=True)
+
+    out = asyncio.run(run())
+    assert all(isinstance(e, RuntimeError) for e in out)
+    assert batcher._inflight == 0 and not batcher._tasks
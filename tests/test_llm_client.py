@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+pytest.importorskip("openai")
+
+from gec_service import llm_client
+from gec_service.config import settings
+from gec_service.llm_client import LLMClient, TokenBucket
+
+ANSWER = {"input": "He go.", "reasoning": "r", "correction": "He goes.", "error_type": "SVA"}
+
+
+def _completion(content=None):
+    return httpx.Response(
+        200,
+        json={
+            "id": "x",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "m",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content or json.dumps(ANSWER)}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 7, "total_tokens": 12},
+        },
+    )
+
+
+@pytest.fixture(autouse=True)
+def _unloaded_sdk(monkeypatch):
+    # every test starts from a process that has not imported the SDK yet
+    monkeypatch.setattr(llm_client, "openai", None)
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "LLM_BACKOFF_BASE", 0.01)
+
+
+def test_sync_path_loads_the_sdk_on_first_use():
+    seen = []
+
+    def handler(request):
+        seen.append(json.loads(request.content))
+        return _completion()
+
+    client = LLMClient(transport=httpx.MockTransport(handler))
+    assert client.complete_sync("p")["correction"] == "He goes."
+    assert seen[0]["max_tokens"] == 256 and seen[0]["temperature"] == 0.0
+
+
+def test_timeout_ends_after_retries_without_repair_rounds():
+    calls = []
+
+    async def handler(request):
+        calls.append(1)
+        await asyncio.sleep(1.0)
+        return _completion()
+
+    client = LLMClient(timeout=0.05, max_attempts=2, transport=httpx.MockTransport(handler))
+    out = asyncio.run(client.complete("p"))
+    assert out["correction"] == "" and len(calls) == 2
+    assert client.timeouts == 2 and client.retries == 1
+
+
+def test_failed_attempts_back_off_and_retry():
+    calls = []
+
+    def handler(request):
+        calls.append(time.perf_counter())
+        return httpx.Response(500, json={"error": {"message": "boom"}}) if len(calls) < 3 else _completion()
+
+    client = LLMClient(max_attempts=3, transport=httpx.MockTransport(handler))
+    assert asyncio.run(client.complete("p"))["correction"] == "He goes."
+    assert client.retries == 2 and client.failures == 2
+    # the second retry waits at least half of 2 * LLM_BACKOFF_BASE
+    assert calls[2] - calls[1] >= 0.01
+
+
+def test_unparseable_answer_gets_one_repair_round():
+    prompts = []
+
+    def handler(request):
+        prompts.append(json.loads(request.content)["messages"][-1]["content"])
+        return _completion("not json" if len(prompts) == 1 else None)
+
+    client = LLMClient(transport=httpx.MockTransport(handler))
+    assert asyncio.run(client.complete("p"))["correction"] == "He goes."
+    assert len(prompts) == 2 and "not a valid JSON object" in prompts[1]
+
+
+def test_token_bucket_limits_the_request_rate():
+    async def run():
+        bucket = TokenBucket(rate=20, burst=1)
+        start = time.perf_counter()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.perf_counter() - start
+
+    assert asyncio.run(run()) >= 0.18
+
+
+def test_semaphore_caps_requests_in_flight():
+    active, peak = [0], [0]
+
+    async def handler(request):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.02)
+        active[0] -= 1
+        return _completion()
+
+    async def run():
+        client = LLMClient(max_concurrency=2, transport=httpx.MockTransport(handler))
+        return await asyncio.gather(*(client.complete("p") for _ in range(6)))
+
+    assert all(out["correction"] == "He goes." for out in asyncio.run(run()))
+    assert peak[0] == 2
+
+
+def test_hedged_request_wins_over_a_slow_first_attempt():
+    calls = []
+
+    async def handler(request):
+        calls.append(1)
+        if len(calls) == 1:
+            await asyncio.sleep(1.0)
+        return _completion()
+
+    client = LLMClient(hedge=True, hedge_delay=0.05, transport=httpx.MockTransport(handler))
+    start = time.perf_counter()
+    assert asyncio.run(client.complete("p"))["correction"] == "He goes."
+    assert time.perf_counter() - start < 0.5
+    assert client.hedges == 1 and client.hedge_wins == 1
@@ -0,0 +1,117 @@
+import json
+import zlib
+
+import numpy as np
+import pytest
+
+import precompute
+
+
+@pytest.fixture(autouse=True)
+def _fake_encoder(monkeypatch):
+    # deterministic per-text vectors instead of downloading a sentence-transformers model
+    def encode(texts, batch_size):
+        return np.stack([np.random.default_rng(zlib.crc32(t.encode())).standard_normal(16).astype(np.float32) for t in texts])
+
+    monkeypatch.setattr(precompute, "_encode", encode)
+
+
+def _write(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for inp, corr in rows:
+            f.write(json.dumps({"input": inp, "correction": corr}) + "\n")
+
+
+def _rows(n, start=0):
+    return [(f"He go to school number {i}.", f"He goes to school number {i}.") for i in range(start, start + n)]
+
+
+def test_service_loads_the_index_type_the_snapshot_was_built_with(tmp_path, monkeypatch):
+    pytest.importorskip("faiss")
+    from gec_service import api
+
+    src, out = str(tmp_path / "support.jsonl"), str(tmp_path / "support")
+    _write(src, _rows(40))
+    precompute.build_index(src, out, index_type="hnsw", workers=1)
+    monkeypatch.setattr(api, "SUPPORT_INDEX_PATH", out)
+    store = api._open_support()
+    assert store.index_info()["type"] == "hnsw"
+    assert store._index is not None and not store._exact_scan
+
+
+def test_update_encodes_only_new_rows_and_keeps_unchanged_ones(tmp_path, monkeypatch):
+    from gec_service.vector_store import VectorStore
+
+    src, base, out = str(tmp_path / "v1.jsonl"), str(tmp_path / "support.v1"), str(tmp_path / "support.v2")
+    rows = _rows(30)
+    _write(src, rows)
+    precompute.build_index(src, base, workers=1)
+
+    encoded = []
+    real = precompute._encode
+
+    def counting(texts, batch_size):
+        encoded.extend(texts)
+        return real(texts, batch_size)
+
+    monkeypatch.setattr(precompute, "_encode", counting)
+    # append five rows and change one correction (same input, so its vector is reused)
+    rows[3] = (rows[3][0], "He goes to school, number 3.")
+    _write(src, rows + _rows(5, start=30))
+    updated = precompute.update_index(src, base, out, workers=1)
+
+    assert sorted(encoded) == sorted(inp for inp, _ in _rows(5, start=30))
+    old = VectorStore()
+    old.load(base)
+    assert updated.count() == 35
+    for row in range(30):
+        if row == 3:
+            assert updated.is_deleted(row)
+            continue
+        assert updated.items[row] == old.items[row]
+        assert (updated.vectors([row]) == old.vectors([row])).all()
+    by_input = {it["value"]["input"]: r for r, it in enumerate(updated.items) if not updated.is_deleted(r)}
+    moved = by_input[rows[3][0]]
+    assert updated.items[moved]["value"]["correction"] == "He goes to school, number 3."
+    assert (updated.vectors([moved]) == old.vectors([3])).all()
+
+
+def test_each_published_version_carries_its_own_lexical_index(tmp_path, monkeypatch):
+    import os
+
+    from gec_service import api
+    from gec_service.config import settings
+    from gec_service.vector_store import publish_version
+
+    root = tmp_path / "support"
+    for version, word in (("v1", "school"), ("v2", "market")):
+        src = str(tmp_path / f"{version}.jsonl")
+        _write(src, [(f"He go to the {word} {i}.", f"He goes to the {word} {i}.") for i in range(10)])
+        precompute.build_index(src, str(root / version), workers=1)
+        assert os.path.exists(root / version / "lexical.npz")
+    assert not any(name.endswith(".lexical.npz") for name in os.listdir(root))
+
+    monkeypatch.setattr(api, "SUPPORT_INDEX_PATH", str(root))
+    monkeypatch.setattr(settings, "RETRIEVAL_MODE", "lexical")
+    publish_version(str(root), "v1")
+    publish_version(str(root), "v2")
+    store = api._open_support()
+    hits = store.query_lexical(["She go to the market."], top_k=1)[0]
+    assert "market" in hits[0][0]["value"]["input"]
+
+
+def test_resume_refuses_shards_of_an_edited_input(tmp_path):
+    import os
+
+    src, shard_dir = str(tmp_path / "support.jsonl"), str(tmp_path / "support.shards")
+    _write(src, _rows(10))
+    assert precompute.encode_shards(src, shard_dir, chunk_size=4, workers=1) == 3
+    # an unchanged input resumes from its shards
+    assert precompute.encode_shards(src, shard_dir, chunk_size=4, workers=1) == 3
+
+    _write(src, _rows(10, start=100))
+    stat = os.stat(src)
+    os.utime(src, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    with pytest.raises(ValueError, match="different build"):
+        precompute.encode_shards(src, shard_dir, chunk_size=4, workers=1)
+    assert precompute.encode_shards(src, shard_dir, chunk_size=4, workers=1, resume=False) == 3
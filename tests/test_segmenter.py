@@ -0,0 +1,31 @@
+from gec_service.segmenter import split_sentences
+
+
+def test_offsets_round_trip_and_abbreviations():
+    text = "  Dr. Smith go to school. He said \"hi!\" Then left?\n\nNo final stop  "
+    spans = split_sentences(text)
+    assert [s for _, _, s in spans] == ["Dr. Smith go to school.", 'He said "hi!"', "Then left?", "No final stop"]
+    assert all(text[start:end] == sent for start, end, sent in spans)
+
+
+def test_empty_input():
+    assert split_sentences("   ") == []
+
+
+def test_ordinary_words_end_sentences_unless_a_number_follows():
+    def sents(text):
+        return [s for _, _, s in split_sentences(text)]
+
+    assert sents("The answer is no. She left.") == ["The answer is no.", "She left."]
+    assert sents("See item No. 5 first. Then stop.") == ["See item No. 5 first.", "Then stop."]
+    assert sents("The firm was est. 1990 in Leeds. It grew.") == ["The firm was est. 1990 in Leeds.", "It grew."]
+    assert sents("He joined the co. She stayed.") == ["He joined the co.", "She stayed."]
+
+
+def test_single_letters_are_initials_only_inside_names():
+    def sents(text):
+        return [s for _, _, s in split_sentences(text)]
+
+    assert sents("X go y. Z go w.") == ["X go y.", "Z go w."]
+    assert sents("We chose Plan B. Then we left.") == ["We chose Plan B.", "Then we left."]
+    assert sents("J. K. Rowling wrote it. John F. Kennedy read it.") == ["J. K. Rowling wrote it.", "John F. Kennedy read it."]
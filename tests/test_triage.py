@@ -0,0 +1,15 @@
+from gec_service.triage import Triage
+
+
+def _n(text, correction, sim):
+    return ({"value": {"input": text, "correction": correction}}, sim)
+
+
+def test_vote_weights_no_change_neighbours():
+    t = Triage(mode="on", k=5, threshold=0.7, min_similarity=0.5, min_votes=2)
+    same = [_n("A b.", "A b.", 0.9), _n("C d.", "C d.", 0.8), _n("He go.", "He goes.", 0.6)]
+    assert t.decide(same) is True
+    assert t.decide([_n("He go.", "He goes.", 0.9), _n("A b.", "A b.", 0.6)]) is False
+    # too few neighbours above the similarity floor
+    assert t.decide([_n("A b.", "A b.", 0.9), _n("C d.", "C d.", 0.1)]) is False
+    assert Triage(mode="off").decide(same) is None
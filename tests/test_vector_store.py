@@ -0,0 +1,145 @@
+import numpy as np
+
+
+def _unit(rows: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    x = np.random.default_rng(seed).standard_normal((rows, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_topk_inner_product_matches_full_sort():
+    from gec_service.vector_store import topk_inner_product
+
+    embs, q = _unit(500), _unit(7, seed=1)
+    D, I = topk_inner_product(embs, q, 5, chunk_rows=64, query_chunk=3)
+    sims = q @ embs.T
+    ref = np.argsort(-sims, axis=1)[:, :5]
+    assert (I == ref).all()
+    assert np.allclose(D, np.take_along_axis(sims, ref, axis=1))
+
+
+def test_query_batch_index_and_numpy_paths_agree():
+    from gec_service.vector_store import VectorStore
+
+    embs = _unit(200)
+    store = VectorStore()
+    store.add_vectors(embs, [{"i": i} for i in range(200)])
+    indexed = store.query_batch(embs[:4], top_k=3)
+    store._index = None
+    brute = store.query_batch(embs[:4], top_k=3)
+    assert [[m["i"] for m, _ in r] for r in indexed] == [[m["i"] for m, _ in r] for r in brute]
+    assert [r[0][0]["i"] for r in brute] == [0, 1, 2, 3]
+
+
+def test_directory_snapshot_round_trip_with_wal(tmp_path):
+    from gec_service.vector_store import MappedItems, VectorStore
+
+    embs = _unit(50)
+    path = str(tmp_path / "idx")
+    src = VectorStore()
+    src.add_vectors(embs[:40], [{"i": i} for i in range(40)])
+    src.save(path)
+
+    store = VectorStore(path=path)
+    store.load(path)
+    assert isinstance(store.items, MappedItems) and not store.embeddings.flags.writeable
+    store.add_vectors(embs[40:], [{"i": i} for i in range(40, 50)])
+    store.delete([0])
+
+    # a second process sees the snapshot plus the write-ahead log
+    other = VectorStore(path=path)
+    other.load(path)
+    assert len(other.items) == 50 and other.count() == 49
+    assert [m["i"] for m, _ in other.query_batch(embs[[0, 45]], top_k=1)[1]] == [45]
+    assert other.query_vector(embs[0], top_k=1)[0][0]["i"] != 0
+
+
+def test_compressed_storage_keeps_neighbours_and_survives_snapshot(tmp_path):
+    from gec_service.vector_store import VectorStore
+
+    embs = _unit(300, dim=32)
+    exact = VectorStore(storage="float32")
+    exact.add_vectors(embs, [{"i": i} for i in range(300)])
+    want = exact.query_batch(embs[:5], top_k=3)
+    for storage in ("float16", "int8"):
+        store = VectorStore(storage=storage)
+        store.add_vectors(embs, [{"i": i} for i in range(300)])
+        assert store.bytes_per_row() < exact.bytes_per_row()
+        got = store.query_batch(embs[:5], top_k=3)
+        assert [r[0][0]["i"] for r in got] == [0, 1, 2, 3, 4]
+        for g, w in zip(got, want):
+            assert abs(g[0][1] - w[0][1]) < 1e-2
+        path = str(tmp_path / storage)
+        store.save(path)
+        loaded = VectorStore()
+        loaded.load(path)
+        assert loaded._codec.name == storage
+        assert np.array_equal(loaded._buf[: loaded._size], store._buf[: store._size])
+
+
+def test_lexical_and_hybrid_retrieval_skip_tombstones():
+    from gec_service.vector_store import VectorStore
+    from gec_service.lexical import LexicalIndex, text_of
+
+    texts = ["He go to school.", "She go to school.", "Cats sleep all day.", "The weather is nice."]
+    embs = _unit(4, dim=16)
+    store = VectorStore()
+    store.add_vectors(embs, [{"input": t} for t in texts])
+    store.lexical = LexicalIndex.build(text_of(it) for it in store.items)
+
+    lex = store.query_lexical(["They go to school."], top_k=2)[0]
+    assert [m["input"] for m, _ in lex] == texts[:2]
+    store.delete([0])
+    after = [m["input"] for m, _ in store.query_lexical(["They go to school."], top_k=2)[0]]
+    assert after[0] == texts[1] and texts[0] not in after
+
+    # row 3 wins dense, row 1 wins lexical; both survive fusion with cosine scores
+    hybrid = store.query_hybrid(["She go to school."], embs[[3]], top_k=2)[0]
+    assert {m["input"] for m, _ in hybrid} == {texts[1], texts[3]}
+    assert all(-1.0 <= s <= 1.0 + 1e-6 for _, s in hybrid)
+
+
+def test_rerank_only_rescored_pq_candidates():
+    import pytest
+
+    pytest.importorskip("faiss")
+    from gec_service.vector_store import VectorStore
+
+    embs, q = _unit(600, dim=32), _unit(5, dim=32, seed=1)
+    exact = (q @ embs.T).max(axis=1)
+    # hnsw holds float32 vectors; re-scoring them from int8 rows would only add error
+    hnsw = VectorStore(index_type="hnsw", storage="int8", rerank_k=32)
+    hnsw.add_vectors(embs, [{"i": i} for i in range(600)])
+    assert not hnsw._lossy_scores()
+    assert np.allclose([r[0][1] for r in hnsw.query_batch(q, top_k=1)], exact, atol=1e-5)
+    # a trained PQ index scores codes; its candidates are re-scored from the float32 rows
+    pq = VectorStore(index_type="pq", index_params={"m": 8, "nbits": 4, "train_size": 400}, rerank_k=32)
+    pq.add_vectors(embs, [{"i": i} for i in range(600)])
+    assert pq._lossy_scores()
+    assert np.allclose([r[0][1] for r in pq.query_batch(q, top_k=1)], exact, atol=1e-5)
+
+
+def test_directory_snapshot_leaves_foreign_files_alone(tmp_path):
+    import pytest
+    from gec_service.vector_store import VectorStore
+
+    embs = _unit(10)
+    store = VectorStore()
+    store.add_vectors(embs, [{"i": i} for i in range(10)])
+
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "notes.txt").write_text("keep me")
+    with pytest.raises(FileExistsError):
+        store.save(str(data))
+    assert sorted(p.name for p in data.iterdir()) == ["notes.txt"]
+
+    path = tmp_path / "idx"
+    store.save(str(path))
+    (path / "README").write_text("mine")
+    (path / "embeddings.99.npy").write_bytes(b"left by an interrupted save")
+    store.save(str(path))
+    names = {p.name for p in path.iterdir()}
+    assert "README" in names and "embeddings.99.npy" not in names
+    loaded = VectorStore()
+    loaded.load(str(path))
+    assert loaded.count() == 10